@@ -0,0 +1,103 @@
+from array import array
+from itertools import accumulate, islice
+import os
+import subprocess
+import tempfile
+import threading
+
+CHUNK_SIZE = 1024 * 1024
+BINARY_CHECK_SIZE = 8000
+MAX_LINE_LENGTH = 4096
+
+def is_binary(block: bytes) -> bool:
+    """
+    same heuristic as git: data is binary if there is zero byte in first BINARY_CHECK_SIZE bytes
+    """
+    return b'\0' in block[:BINARY_CHECK_SIZE]
+
+class BlobFile:
+    """
+    blob streamed from git cat-file to temporary file in chunks with offsets of line starts,
+    lines are read from file when asked for, so memory use does not depend on blob size,
+    first chunk is read in constructor (to tell binary blobs apart), rest is read by read_rest
+    which can run on worker thread while lines that are already read are shown
+    """
+    def __init__(self, repo, oid, chunk_size = CHUNK_SIZE):
+        self.oid = oid
+        self.size = 0
+        self.binary = False
+        self.complete = False
+        self._chunk_size = chunk_size
+        self._offsets = array('q', [0])
+        self._file = tempfile.TemporaryFile()
+        self._lock = threading.Lock()
+        self._process = subprocess.Popen(['git', 'cat-file', 'blob', oid], cwd = repo, stdout = subprocess.PIPE, stderr = subprocess.DEVNULL)
+        chunk = self._process.stdout.read(chunk_size)
+        if is_binary(chunk):
+            self.binary = True
+            self._finish()
+            return
+        self._append(chunk)
+        if not chunk:
+            self._finish()
+
+    def _append(self, chunk):
+        parts = chunk.split(b'\n')
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            self._file.write(chunk)
+            self._offsets.extend(islice(accumulate(map((1).__add__, map(len, parts[:-1])), initial = self.size), 1, None))
+            self.size += len(chunk)
+
+    def _finish(self):
+        process = self._process
+        process.kill()
+        process.wait()
+        with self._lock:
+            if not self.binary and self._offsets[-1] != self.size:
+                self._offsets.append(self.size)
+            self._file.flush()
+            self.complete = True
+
+    def read_rest(self, progress = None):
+        """
+        reads rest of blob, progress(lines) is called after each chunk
+        """
+        if self.complete:
+            return
+        try:
+            while True:
+                chunk = self._process.stdout.read(self._chunk_size)
+                if not chunk:
+                    break
+                self._append(chunk)
+                if progress is not None:
+                    progress(len(self))
+        finally:
+            self._finish()
+        if progress is not None:
+            progress(len(self))
+
+    def cancel(self):
+        """
+        stops read_rest from any thread
+        """
+        self._process.kill()
+
+    def __len__(self):
+        """
+        number of lines read so far
+        """
+        return max(0, len(self._offsets) - 1)
+
+    def line(self, y) -> str:
+        with self._lock:
+            start = self._offsets[y]
+            end = min(self._offsets[y + 1], start + MAX_LINE_LENGTH)
+            self._file.seek(start)
+            data = self._file.read(end - start)
+        return data.rstrip(b'\n').rstrip(b'\r').decode('utf-8', errors = 'replace')
+
+    def close(self):
+        self.cancel()
+        self._file.close()
@@ -0,0 +1,116 @@
+from PyQt5 import QtCore, QtWidgets
+from PyQt5.QtCore import Qt
+from BlobFile import BlobFile
+from LRUCache import LRUCache
+import time
+
+LINE_CACHE_SIZE = 4096
+PROGRESS_INTERVAL = 0.25
+
+class BlobReader(QtCore.QThread):
+    """
+    reads rest of BlobFile on worker thread, reports number of lines read so far at most every PROGRESS_INTERVAL seconds
+    (view relayouts all rows when rows are added) and when blob is read
+    """
+
+    linesRead = QtCore.pyqtSignal(int)
+
+    def __init__(self, blob: BlobFile, parent = None):
+        super().__init__(parent)
+        self._blob = blob
+
+    def run(self):
+        last = time.perf_counter()
+
+        def progress(lines):
+            nonlocal last
+            now = time.perf_counter()
+            if now - last >= PROGRESS_INTERVAL:
+                last = now
+                self.linesRead.emit(lines)
+
+        self._blob.read_rest(progress)
+        self.linesRead.emit(len(self._blob))
+
+class BlobModel(QtCore.QAbstractListModel):
+    """
+    lines of BlobFile, only lines that view asks for are read and decoded,
+    rows are added as blob is read
+    """
+    def __init__(self, blob: BlobFile, parent = None):
+        super().__init__(parent)
+        self._blob = blob
+        self._count = len(blob)
+        self._lines = LRUCache(LINE_CACHE_SIZE)
+
+    def setLineCount(self, count):
+        if count <= self._count:
+            return
+        self.beginInsertRows(QtCore.QModelIndex(), self._count, count - 1)
+        self._count = count
+        self.endInsertRows()
+
+    def rowCount(self, parent = QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._count
+
+    def data(self, index, role = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        y = index.row()
+        line = self._lines.get(y)
+        if line is None:
+            line = self._blob.line(y)
+            self._lines.put(y, line, 1)
+        return line
+
+class BlobView(QtWidgets.QListView):
+    """
+    read-only view of large text blob, rows have uniform height so only visible lines are materialized
+    """
+    def __init__(self, parent = None):
+        super().__init__(parent)
+        self.setUniformItemSizes(True)
+        self.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
+        self._blob = None
+        self._reader = None
+
+    def setBlob(self, blob: BlobFile | None):
+        """
+        shows lines of blob that are read so far, rest is read in background, view owns blob
+        """
+        old = self.model()
+        oldBlob = self._blob
+        oldReader = self._reader
+        self._blob = blob
+        self._reader = None
+        model = None if blob is None else BlobModel(blob, self)
+        self.setModel(model)
+        if blob is not None and not blob.complete:
+            reader = BlobReader(blob, self)
+            reader.linesRead.connect(self.onLinesRead)
+            reader.finished.connect(self.onReaderFinished)
+            self._reader = reader
+            reader.start()
+        if old is not None:
+            old.deleteLater()
+        if oldReader is not None:
+            oldBlob.cancel()
+            oldReader.wait()
+        if oldBlob is not None:
+            oldBlob.close()
+
+    def onReaderFinished(self):
+        reader = self.sender()
+        reader.deleteLater()
+        if reader is self._reader:
+            self._reader = None
+
+    def onLinesRead(self, count):
+        if self.sender() is self._reader:
+            self.model().setLineCount(count)
+
+    def blob(self) -> BlobFile | None:
+        return self._blob
@@ -1,19 +1,69 @@
+import datetime
+
+def parse_tz(tz: str) -> int:
+    """
+    "+0130" -> 90 (minutes east of UTC)
+    """
+    minutes = int(tz[1:3]) * 60 + int(tz[3:5])
+    return -minutes if tz[0] == '-' else minutes
+
+def git_datetime(timestamp: int, tz: int) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone(datetime.timedelta(minutes=tz)))
+
 class Commit:
+    """
+    message and signature are kept as offsets into raw commit data and decoded when asked for
+    """
     def __init__(self, sha, sha_short = None):
         self.sha = sha
         self.sha_short = sha_short
         self.parent = []
         self.author = None
         self.committer = None
-        self.message = []
-        self.message_oneline = None
-        self.gpgsig = []
+        self._raw = b''
+        self._message = (0, 0)
+        self._indent = 0
+        self._gpgsig = (0, 0)
         self.x = None
         self.x2 = None
         self.y = None
         self.color = None
-        self.author_date = None
-        self.committer_date = None
+        self.author_time = None
+        self.author_tz = 0
+        self.committer_time = None
+        self.committer_tz = 0
+
+    @property
+    def author_date(self):
+        return git_datetime(self.author_time, self.author_tz)
+
+    @property
+    def committer_date(self):
+        return git_datetime(self.committer_time, self.committer_tz)
+
+    @property
+    def message(self) -> list[str]:
+        start, end = self._message
+        lines = self._raw[start:end].decode('utf-8', errors='replace').split('\n')
+        indent = self._indent
+        lines = [line[indent:] for line in lines]
+        while len(lines) > 0 and lines[-1] == '':
+            lines.pop()
+        return lines
+
+    @property
+    def message_oneline(self) -> str:
+        start, end = self._message
+        eol = self._raw.find(b'\n', start, end)
+        return self._raw[start + self._indent:end if eol < 0 else eol].decode('utf-8', errors='replace')
+
+    @property
+    def gpgsig(self) -> list[str]:
+        start, end = self._gpgsig
+        if start == end:
+            return []
+        lines = self._raw[start:end].decode('ascii', errors='replace').split('\n')
+        return lines[:1] + [line[1:] for line in lines[1:]]
     
     def p(self):
         return self.x, self.y
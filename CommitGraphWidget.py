@@ -1,15 +1,36 @@
 from PyQt5 import QtGui, QtWidgets, QtCore
 from PyQt5.QtCore import QPointF, QRectF, Qt, QSizeF, QSize
 from PyQt5.QtGui import QColor, QPen, QBrush, QTextOption
-from Commit import Commit
+from CommitTable import CommitTable, CommitRow
 from Path import Path
-import datetime
+from RowIndex import RowIndex
+from LRUCache import LRUCache
+from array import array
+from bisect import bisect_left, bisect_right
+import math
 import time
+import tracing
 
 PAD_LEFT = 10
 PAD_TOP = 10
 COL_WIDTH = 18
 ROW_HEIGHT = 18
+DEFAULT_COLOR = '#cccccc'
+TILE_HEIGHT = ROW_HEIGHT * 64
+TILE_WIDTH = 1024
+TILE_CACHE_COST = 64 * 1024 * 1024
+STATIC_TEXT_CACHE_SIZE = 4096
+
+SEASON_COLORS = [
+    "#f07167", # spring
+    "#55a630", # summer
+    "#f77f00", # autumn
+    "#00b4d8", # winter
+]
+
+SEASONS = [
+    -1,3,3,0,0,0,1,1,1,2,2,2,3
+]
 
 class CommitGraphWidget(QtWidgets.QWidget):
 
@@ -22,18 +43,166 @@ class CommitGraphWidget(QtWidgets.QWidget):
         self._showDate = False
         self._showTime = False
         self._showAuthor = False
-        self.init([], [])
+        self._tiles = LRUCache(TILE_CACHE_COST)
+        self.init(CommitTable(), [])
         
-    def init(self, commits, paths):
+    def init(self, commits: CommitTable, paths, count = None):
+        """
+        shows first count rows of commits (all rows by default)
+        """
         self.commits = commits
-        self.paths = paths
+        self._count = len(commits) if count is None else count
+        self._matches = []
+        self._dates = []
+        self._dateStrings = dict()
+        self.paths = []
+        self._stubs = []
+        self._pathIndex = RowIndex()
+        self._addPaths(paths)
+        self._initMetrics()
+        self._initTransform()
+
+    def _initMetrics(self):
         fm = QtGui.QFontMetrics(self.font())
         self._dateSize = fm.horizontalAdvance("2024-00-00") + 10
         self._timeSize = fm.horizontalAdvance("00:00:00") + 10
         self._authorSize = fm.averageCharWidth() * 25
-        self._commitMessageSize = fm.averageCharWidth() * 80
+        self._textHeight = QtGui.QFontMetricsF(self.font()).height()
+        self._advances = array('d')
+        self._textWidth = 0.0
+        self._staticTexts = LRUCache(STATIC_TEXT_CACHE_SIZE)
+        self._measureRows(self._count)
+
+    def _measureRows(self, count):
+        """
+        computes message advances of rows up to count
+        """
+        fm = QtGui.QFontMetricsF(self.font())
+        subject = self.commits.subject
+        x2 = self.commits.x2
+        advances = self._advances
+        textWidth = self._textWidth
+        for y in range(len(advances), count):
+            advance = fm.horizontalAdvance(subject[y])
+            advances.append(advance)
+            textWidth = max(textWidth, x2[y] * COL_WIDTH + advance)
+        self._textWidth = textWidth
+
+    def _formatDates(self, y1, y2):
+        """
+        formats author date and time (local time) of rows y1 .. y2 once, returns list of (date, time, season) of all formatted rows
+        """
+        dates = self._dates
+        if len(dates) <= y2:
+            dates.extend([None] * (y2 + 1 - len(dates)))
+        strings = self._dateStrings
+        author_time = self.commits.author_time
+        for y in range(y1, y2 + 1):
+            if dates[y] is not None:
+                continue
+            t = time.localtime(author_time[y])
+            date = "{:04d}-{:02d}-{:02d}".format(t.tm_year, t.tm_mon, t.tm_mday)
+            date = strings.setdefault(date, date)
+            dates[y] = (date, "{:02d}:{:02d}:{:02d}".format(t.tm_hour, t.tm_min, t.tm_sec), SEASONS[t.tm_mon])
+        return dates
+
+    def prependCommits(self, commits: CommitTable, count, paths):
+        """
+        shows commits table that has count new rows on top of rows shown before and paths of new rows,
+        only new rows are measured and only new paths are indexed, old paths keep their rows (table's shift grew)
+        """
+        fm = QtGui.QFontMetricsF(self.font())
+        self.commits = commits
+        self._count += count
+        advances = array('d', [fm.horizontalAdvance(subject) for subject in commits.subject[:count]])
+        textWidth = max(self._textWidth, max(commits.x2[y] * COL_WIDTH + advances[y] for y in range(count)))
+        advances += self._advances
+        # edges from new rows run down in free lanes of old rows, which moves their messages right
+        shift = commits.shift
+        path: Path
+        for path in paths:
+            points = path._points
+            for (x1, y1), (x2, y2) in zip(points, points[1:]):
+                if x1 == x2 and y1 + shift >= count:
+                    textWidth = max(textWidth, (x1 + 1) * COL_WIDTH + max(advances[y1 + shift:y2 + shift + 1]))
+        self._advances = advances
+        self._textWidth = textWidth
+        self._dates = [None] * count + self._dates
+        self._matches = [y + count for y in self._matches]
+        self._staticTexts.clear()
+        self._pathIndex.prepend(count)
+        self._addPaths(paths)
         self._initTransform()
 
+    def _staticText(self, y) -> QtGui.QStaticText:
+        text = self._staticTexts.get(y)
+        if text is None:
+            text = QtGui.QStaticText(self.commits.subject[y])
+            text.setTextFormat(Qt.TextFormat.PlainText)
+            text.prepare(QtGui.QTransform(), self.font())
+            self._staticTexts.put(y, text, 1)
+        return text
+
+    def appendCommits(self, count, paths):
+        """
+        shows first count rows of commits table that was given to init and more paths
+        """
+        if count == self._count and len(paths) == 0:
+            return
+        self._invalidateRows(self._count - 1, count)
+        self._count = count
+        self._measureRows(count)
+        self._addPaths(paths)
+        self.resize(self.sizeHint())
+        self.update()
+
+    def setStubs(self, paths):
+        """
+        shows open-ended paths to parents below last shown row instead of previous ones
+        """
+        shift = self.commits.shift
+        for path in self._stubs + paths:
+            ys = [y for x, y in path._points]
+            self._invalidateRows(min(ys) + shift, max(ys) + shift)
+        self._stubs = paths
+        self.update()
+
+    def _addPaths(self, paths):
+        shift = self.commits.shift
+        path: Path
+        for path in paths:
+            ys = [y for x, y in path._points]
+            y1 = min(ys) + shift
+            y2 = max(ys) + shift
+            self._pathIndex.add(path, y1, y2)
+            self._invalidateRows(y1, y2)
+        self.paths.extend(paths)
+
+    def invalidateTiles(self):
+        """
+        drops all rendered tiles, call when commit or path colors change
+        """
+        self._tiles.clear()
+        self.update()
+
+    def _invalidateRows(self, y1, y2):
+        top = self._transform.map(QPointF(0, y1 - 1)).y()
+        bottom = self._transform.map(QPointF(0, y2 + 1)).y()
+        columns = self.width() // TILE_WIDTH + 1
+        for band in range(max(0, int(top)) // TILE_HEIGHT, max(0, int(bottom)) // TILE_HEIGHT + 1):
+            for column in range(columns):
+                self._tiles.pop((band, column))
+
+    def _visibleRows(self, rect):
+        """
+        first and last row intersecting rect
+        """
+        y1 = self._inv_transform.map(QPointF(rect.topLeft())).y()
+        y2 = self._inv_transform.map(QPointF(rect.bottomLeft())).y()
+        y1 = max(0, math.floor(y1) - 1)
+        y2 = min(self._count - 1, math.ceil(y2) + 1)
+        return y1, y2
+
     def setShowDate(self, value):
         if self._showDate == value:
             return
@@ -66,36 +235,55 @@ class CommitGraphWidget(QtWidgets.QWidget):
         inv_transform, _ = transform.inverted()
         self._transform = transform
         self._inv_transform = inv_transform
+        self._tiles.clear()
         self.resize(self.sizeHint())
+        self.update()
+
+    def setMatches(self, rows):
+        """
+        highlights rows (sorted) found by search
+        """
+        self._matches = rows
+        self.update()
+
+    def matches(self):
+        return self._matches
+
+    def rowCenter(self, y) -> QPointF:
+        """
+        position of row's circle in widget coordinates without lane offset
+        """
+        return self._transform.map(QPointF(0, y))
 
     def selected(self):
         return self._selected
     
+    def count(self):
+        return self._count
+
     def currentIndex(self):
         if self._selected is None:
             return
-        for i, commit in enumerate(self.commits):
-            if commit.sha == self._selected:
-                return i
+        return self.commits.row(self._selected)
 
     def selectNext(self):
-        if self._selected is None:
+        y = self.currentIndex()
+        if y is None:
             return
-        else:
-            self.selectIndex(self.currentIndex() - 1)
+        self.selectIndex(y - 1)
 
     def selectPrev(self):
-        if self._selected is None:
+        y = self.currentIndex()
+        if y is None:
             return
-        else:
-            self.selectIndex(self.currentIndex() + 1)
+        self.selectIndex(y + 1)
 
     def selectIndex(self, y):
 
-        if y < 0 or y >= len(self.commits):
+        if y < 0 or y >= self._count:
             return
 
-        sha = self.commits[y].sha
+        sha = self.commits.sha(y)
         if sha == self._selected:
             return
         self._selected = sha
@@ -107,27 +295,103 @@ class CommitGraphWidget(QtWidgets.QWidget):
         y = point.y()
         if y < 0:
             y = 0
-        if y >= len(self.commits):
-            y = len(self.commits) - 1
+        if y >= self._count:
+            y = self._count - 1
         self.selectIndex(y)
         return super().mousePressEvent(event)
     
     def sizeHint(self):
-        if len(self.commits) == 0:
+        if self._count == 0:
             return QSize(100, 100)
-        point = self._transform.map(QPointF(5, self.commits[-1].y + 1))
-        return QSize(int(point.x() + self._commitMessageSize), int(point.y()))
+        point = self._transform.map(QPointF(-0.2, self._count))
+        return QSize(math.ceil(point.x() + self._textWidth + 10 + PAD_LEFT), int(point.y()))
+
+    def resizeEvent(self, event):
+        if event.size().width() != event.oldSize().width():
+            self._tiles.clear()
+        super().resizeEvent(event)
+
+    def changeEvent(self, event):
+        if event.type() == QtCore.QEvent.Type.FontChange:
+            self._initMetrics()
+            self._initTransform()
+        elif event.type() == QtCore.QEvent.Type.PaletteChange:
+            self.invalidateTiles()
+        super().changeEvent(event)
+
+    def _tile(self, band, column) -> QtGui.QPixmap:
+        pixmap = self._tiles.get((band, column))
+        if pixmap is None:
+            with tracing.span('render tile', band = band, column = column):
+                pixmap = self._renderTile(band, column)
+            self._tiles.put((band, column), pixmap, pixmap.width() * pixmap.height() * 4)
+        return pixmap
+
+    def _renderTile(self, band, column) -> QtGui.QPixmap:
+        """
+        renders TILE_WIDTH x TILE_HEIGHT pixels of rows without selection, tiles are bounded in both directions
+        so one long subject does not make every tile as wide as the widget
+        """
+        dpr = self.devicePixelRatioF()
+        top = band * TILE_HEIGHT
+        left = column * TILE_WIDTH
+        pixmap = QtGui.QPixmap(math.ceil(TILE_WIDTH * dpr), math.ceil(TILE_HEIGHT * dpr))
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        painter = QtGui.QPainter(pixmap)
+        painter.setFont(self.font())
+        painter.translate(-left, -top)
+        self._paintRows(painter, QtCore.QRect(left, top, TILE_WIDTH, TILE_HEIGHT))
+        painter.end()
+        return pixmap
+
+    def _messageRect(self, commit: CommitRow):
+        p = self._transform.map(QPointF(*commit.p2()) + QPointF(-0.2, -0.5))
+        return QtCore.QRectF(p, QSizeF(self._advances[commit.y] + 10, ROW_HEIGHT))
+
+    def _drawMessage(self, painter: QtGui.QPainter, commit: CommitRow, rect: QtCore.QRectF):
+        p = rect.topLeft() + QPointF(5, (ROW_HEIGHT - self._textHeight) / 2)
+        painter.drawStaticText(p, self._staticText(commit.y))
 
     def paintEvent(self, event):
-        w = self.width() - 5 * 10
-        
+        start = time.perf_counter()
         painter = QtGui.QPainter(self)
 
+        rect = event.rect()
+        for band in range(max(0, rect.top()) // TILE_HEIGHT, max(0, rect.bottom()) // TILE_HEIGHT + 1):
+            for column in range(max(0, rect.left()) // TILE_WIDTH, max(0, rect.right()) // TILE_WIDTH + 1):
+                painter.drawPixmap(column * TILE_WIDTH, band * TILE_HEIGHT, self._tile(band, column))
+
+        # draw search matches over tiles
+        matches = self._matches
+        if len(matches) > 0:
+            row1, row2 = self._visibleRows(rect)
+            color = QColor(self.palette().color(QtGui.QPalette.ColorRole.Highlight))
+            color.setAlpha(60)
+            for y in matches[bisect_left(matches, row1):bisect_right(matches, row2)]:
+                painter.fillRect(self._messageRect(self.commits[y]), color)
+
+        # draw selection over tiles
+        y = self.currentIndex()
+        if y is not None and y < self._count:
+            commit = self.commits[y]
+            rect = self._messageRect(commit)
+            white = QtGui.QColor(QtCore.Qt.GlobalColor.white)
+            highlight = self.palette().color(QtGui.QPalette.ColorRole.Highlight)
+            painter.fillRect(rect, highlight)
+            painter.setPen(QPen(white, 2.0))
+            self._drawMessage(painter, commit, rect)
+
+        painter.end()
+        tracing.add('paint', start, time.perf_counter() - start, height = event.rect().height())
+        super().paintEvent(event)
+
+    def _paintRows(self, painter: QtGui.QPainter, rect: QtCore.QRect):
+        w = self.width() - 5 * 10
+
         painter.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing)
 
-        fm = QtGui.QFontMetricsF(self.font())
-        
-        commit: Commit
+        commit: CommitRow
 
         commits = self.commits
 
@@ -137,68 +401,46 @@ class CommitGraphWidget(QtWidgets.QWidget):
         black = QtGui.QColor(QtCore.Qt.GlobalColor.black)
         red = QtGui.QColor(QtCore.Qt.GlobalColor.red)
 
-        #print("paint event", event.rect(), event.region())
+        row1, row2 = self._visibleRows(rect)
+        commits = commits[row1:row2 + 1]
 
-        if 0:
-            ry1 = max(0, self._inv_transform.map(event.rect().topLeft()).y() - 50)
-            ry2 = min(len(commits)-1, self._inv_transform.map(event.rect().bottomLeft()).y() + 50)
-            commits_ = commits[ry1:ry2]
-            shas = set([commit.sha for commit in commits_])
-
-        # draw paths:
-        t1 = time.time()
+        # draw paths (rows of paths are stored minus shift of table)
+        t1 = time.perf_counter()
+        shift = self.commits.shift
+        pathTransform = QtGui.QTransform.fromTranslate(0, shift) * transform
         path: Path
-        for path in self.paths:
-            """
-            if path._commit not in shas and path._parent not in shas:
-                continue
-            """
+        stubs = [path for path in self._stubs if path._points[0][1] + shift <= row2]
+        for path in self._pathIndex.query(row1, row2) + stubs:
             points = path._points
-            painter.setPen(QtGui.QPen(QtGui.QColor(path._color), 2.0))
+            painter.setPen(QtGui.QPen(QtGui.QColor(path._color or DEFAULT_COLOR), 2.0))
             for (x1, y1), (x2, y2) in zip(points, points[1:]):
-                p1 = transform.map(QPointF(x1, y1))
-                p2 = transform.map(QPointF(x2, y2))
+                p1 = pathTransform.map(QPointF(x1, y1))
+                p2 = pathTransform.map(QPointF(x2, y2))
                 painter.drawLine(p1, p2)
 
         # draw circles
-        t2 = time.time()
+        t2 = time.perf_counter()
         painter.setPen(QtGui.QPen(white, 2.0))
         for commit in commits:
-            painter.setBrush(QColor(commit.color))
+            painter.setBrush(QColor(commit.color or DEFAULT_COLOR))
             p = transform.map(QPointF(commit.x, commit.y))
             painter.drawEllipse(p, 5.0, 5.0)
 
         # draw commit message
-        t3 = time.time()
-        highlight = self.palette().color(QtGui.QPalette.ColorRole.Highlight)
+        t3 = time.perf_counter()
         painter.setPen(QPen(black, 2.0))
-        opt = QtGui.QTextOption(QtCore.Qt.AlignmentFlag.AlignCenter)
+        right = rect.right()
         for commit in commits:
-            p = transform.map(QPointF(*commit.p2()) + QPointF(-0.2, -0.5))
-            horizontalAdvance = fm.horizontalAdvance(commit.message_oneline)
-            rect = QtCore.QRectF(p, QSizeF(horizontalAdvance + 10, ROW_HEIGHT))
-
-            if self._selected == commit.sha:
-                painter.fillRect(rect, highlight)
-                painter.setPen(QPen(white, 2.0))
-            else:
-                painter.setPen(QPen(black, 2.0))
-
-            painter.drawText(rect, commit.message_oneline, opt)
-
-        season_colors = [
-            "#f07167", # spring
-            "#55a630", # summer
-            "#f77f00", # autumn
-            "#00b4d8", # winter
-        ]
-
-        seasons = [
-            -1,3,3,0,0,0,1,1,1,2,2,2,3
-        ]
-        
+            rect = self._messageRect(commit)
+            if rect.left() > right:
+                continue
+            self._drawMessage(painter, commit, rect)
+
         # draw date time and author
-        t4 = time.time()
+        t4 = time.perf_counter()
+        if self._showDate or self._showTime:
+            dates = self._formatDates(row1, row2)
+        seasonColors = [QColor(color) for color in SEASON_COLORS]
         opt = QtGui.QTextOption(QtCore.Qt.AlignmentFlag.AlignVCenter | QtCore.Qt.AlignmentFlag.AlignLeft)
         for commit in commits:
             p0 = transform.map(QPointF(*commit.p0()) + QPointF(-0.2, -0.5))
@@ -214,18 +456,16 @@ class CommitGraphWidget(QtWidgets.QWidget):
             if self._showDate:
                 w = self._dateSize
                 rect = QtCore.QRectF(QPointF(x0, y0), QSizeF(w, ROW_HEIGHT))
-                date: datetime.datetime = commit.author_date.astimezone()
-                color = season_colors[seasons[date.month]]
-                painter.setPen(QColor(color))
-                painter.drawText(rect, date.strftime("%Y-%m-%d"), opt)
+                date, _, season = dates[commit.y]
+                painter.setPen(seasonColors[season])
+                painter.drawText(rect, date, opt)
                 x0 += w
             
             painter.setPen(black)
             if self._showTime:
                 w = self._timeSize
                 rect = QtCore.QRectF(QPointF(x0, y0), QSizeF(w, ROW_HEIGHT))
-                date: datetime.datetime = commit.author_date.astimezone()
-                painter.drawText(rect, date.strftime("%H:%M:%S"), opt)
+                painter.drawText(rect, dates[commit.y][1], opt)
                 x0 += w
 
             if self._showAuthor:
@@ -234,9 +474,13 @@ class CommitGraphWidget(QtWidgets.QWidget):
                 painter.drawText(rect, commit.author, opt)
                 x0 += w
 
-        t5 = time.time()
+        t5 = time.perf_counter()
 
-        #print("path {:.3f} circles {:.3f} message {:.3f} date time author {:.3f} s".format(t2 - t1, t3 - t2, t4 - t3, t5 - t4))
+        rows = row2 + 1 - row1
+        tracing.add('paint paths', t1, t2 - t1, rows = rows)
+        tracing.add('paint circles', t2, t3 - t2, rows = rows)
+        tracing.add('paint messages', t3, t4 - t3, rows = rows)
+        tracing.add('paint date time author', t4, t5 - t4, rows = rows)
 
         # debug markers
         #markers = [(1, 22), (0, 26)]
@@ -247,5 +491,3 @@ class CommitGraphWidget(QtWidgets.QWidget):
             p = transform.map(QPointF(*marker))
             painter.drawEllipse(p, 5.0, 5.0)
 
-        super().paintEvent(event)
-
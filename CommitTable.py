@@ -0,0 +1,305 @@
+from array import array
+from collections import defaultdict
+from itertools import islice
+from Commit import git_datetime
+
+SHA_SIZE = 20
+SHA_SIZES = (20, 32)
+
+class CommitTable:
+    """
+    commits stored column-wise, row index is commit's y in the graph,
+    shas are binary strings in one buffer (20 bytes, or 32 in sha256 repos, taken from first row), parents are row indices (-1 until parent row is appended),
+    authors are interned, colors are indices into palette (-1 for no color), branches are ids of first-parent chains,
+    shift is number of rows put on top of table by prepended, rows in sha index and in paths laid out for table
+    are stored minus shift so putting rows on top does not touch them
+    """
+    def __init__(self):
+        self.shift = 0
+        self.sha_size = SHA_SIZE
+        self._sha = bytearray()
+        self._rows = dict()
+        self._parent_start = array('q', [0])
+        self._parent_sha = bytearray()
+        self._parent = array('q')
+        self._pending = defaultdict(list)
+        self._authors = []
+        self._author_ids = dict()
+        self.author = array('i')
+        self.author_time = array('q')
+        self.author_tz = array('h')
+        self.committer_time = array('q')
+        self.subject = []
+        self.x = array('i')
+        self.x2 = array('i')
+        self.color = array('i')
+        self.branch = array('i')
+        self.palette = []
+
+    def __len__(self):
+        return len(self.subject)
+
+    def __getitem__(self, y):
+        if isinstance(y, slice):
+            return [CommitRow(self, i) for i in range(*y.indices(len(self)))]
+        if y < 0:
+            y += len(self)
+        if y < 0 or y >= len(self):
+            raise IndexError(y)
+        return CommitRow(self, y)
+
+    def __iter__(self):
+        for y in range(len(self)):
+            yield CommitRow(self, y)
+
+    def _append(self, sha: bytes, parents: list[bytes], author: str, author_time: int, author_tz: int, committer_time: int, subject: str) -> int:
+        y = len(self.subject)
+        if len(sha) != self.sha_size:
+            if y > 0 or len(sha) not in SHA_SIZES:
+                raise ValueError('sha {} does not have {} bytes like other shas of table'.format(sha.hex(), self.sha_size))
+            self.sha_size = len(sha)
+        self._sha += sha
+        self._rows[sha] = y - self.shift
+        for pos in self._pending.pop(sha, []):
+            self._parent[pos] = y
+        for parent in parents:
+            if len(parent) != self.sha_size:
+                raise ValueError('parent sha {} does not have {} bytes like other shas of table'.format(parent.hex(), self.sha_size))
+            row = self._rows.get(parent)
+            if row is None:
+                row = -1
+                self._pending[parent].append(len(self._parent))
+            else:
+                row += self.shift
+            self._parent_sha += parent
+            self._parent.append(row)
+        self._parent_start.append(len(self._parent))
+        author_id = self._author_ids.get(author)
+        if author_id is None:
+            author_id = len(self._authors)
+            self._authors.append(author)
+            self._author_ids[author] = author_id
+        self.author.append(author_id)
+        self.author_time.append(author_time)
+        self.author_tz.append(author_tz)
+        self.committer_time.append(committer_time)
+        self.subject.append(subject)
+        self.x.append(-1)
+        self.x2.append(0)
+        self.color.append(-1)
+        self.branch.append(-1)
+        return y
+
+    def append(self, sha: str, parents: list[str], author: str, author_time: int, author_tz: int, committer_time: int, subject: str) -> int:
+        """
+        appends commit (shas in hex, tz as minutes east of UTC), returns its row
+        """
+        return self._append(bytes.fromhex(sha), [bytes.fromhex(parent) for parent in parents], author, author_time, author_tz, committer_time, subject)
+
+    def extend(self, other: 'CommitTable'):
+        """
+        appends all rows of other table keeping their layout
+        """
+        for y in range(len(other)):
+            row = self._append(other.sha_bytes(y), other.parent_shas(y), other.author_name(y), other.author_time[y], other.author_tz[y], other.committer_time[y], other.subject[y])
+            self.x[row] = other.x[y]
+            self.x2[row] = other.x2[y]
+            self.color[row] = other.color[y]
+            self.branch[row] = other.branch[y]
+
+    def prepended(self, top: 'CommitTable') -> 'CommitTable':
+        """
+        new table with rows of top (children of rows of this table or new branches) above rows of this table,
+        columns are concatenated and sha index is copied, only rows of top are visited, this table is not changed
+        """
+        k = len(top)
+        m = len(top._parent)
+        if k > 0 and len(self) > 0 and top.sha_size != self.sha_size:
+            raise ValueError('cannot put {}-byte shas on top of {}-byte shas'.format(top.sha_size, self.sha_size))
+        table = CommitTable()
+        table.shift = self.shift + k
+        table.sha_size = top.sha_size if k > 0 else self.sha_size
+        table._sha = top._sha + self._sha
+        table._rows = self._rows.copy()
+        for y in range(k):
+            table._rows[top.sha_bytes(y)] = y - table.shift
+        table._parent_start = top._parent_start + array('q', map(m.__add__, islice(self._parent_start, 1, None)))
+        table._parent_sha = top._parent_sha + self._parent_sha
+        table._parent = top._parent + array('q', map(k.__add__, self._parent))
+        for sha, positions in self._pending.items():
+            for pos in positions:
+                table._parent[m + pos] = -1
+                table._pending[sha].append(m + pos)
+        for sha, positions in top._pending.items():
+            row = self.row(sha)
+            for pos in positions:
+                if row is None:
+                    table._pending[sha].append(pos)
+                else:
+                    table._parent[pos] = k + row
+        table._authors = self._authors.copy()
+        table._author_ids = self._author_ids.copy()
+        author_ids = []
+        for author in top._authors:
+            author_id = table._author_ids.get(author)
+            if author_id is None:
+                author_id = len(table._authors)
+                table._authors.append(author)
+                table._author_ids[author] = author_id
+            author_ids.append(author_id)
+        table.author = array('i', [author_ids[author] for author in top.author]) + self.author
+        table.author_time = top.author_time + self.author_time
+        table.author_tz = top.author_tz + self.author_tz
+        table.committer_time = top.committer_time + self.committer_time
+        table.subject = top.subject + self.subject
+        table.x = top.x + self.x
+        table.x2 = top.x2 + self.x2
+        table.color = top.color + self.color
+        table.branch = top.branch + self.branch
+        table.palette = self.palette
+        return table
+
+    def row(self, sha) -> int | None:
+        """
+        row of commit by hex or binary sha
+        """
+        if isinstance(sha, str):
+            sha = bytes.fromhex(sha)
+        row = self._rows.get(sha)
+        if row is None:
+            return None
+        return row + self.shift
+
+    def sha_bytes(self, y) -> bytes:
+        size = self.sha_size
+        return bytes(self._sha[y * size:(y + 1) * size])
+
+    def sha(self, y) -> str:
+        size = self.sha_size
+        return self._sha[y * size:(y + 1) * size].hex()
+
+    def parents(self, y) -> list[int]:
+        return self._parent[self._parent_start[y]:self._parent_start[y + 1]].tolist()
+
+    def parent_shas(self, y) -> list[bytes]:
+        size = self.sha_size
+        return [bytes(self._parent_sha[i * size:(i + 1) * size]) for i in range(self._parent_start[y], self._parent_start[y + 1])]
+
+    def author_name(self, y) -> str:
+        return self._authors[self.author[y]]
+
+    def color_name(self, y) -> str | None:
+        color = self.color[y]
+        if color < 0 or color >= len(self.palette):
+            return None
+        return self.palette[color]
+
+    def dump(self) -> dict:
+        return {
+            'sha': bytes(self._sha),
+            'parent_start': self._parent_start.tobytes(),
+            'parent_sha': bytes(self._parent_sha),
+            'parent': self._parent.tobytes(),
+            'authors': self._authors,
+            'author': self.author.tobytes(),
+            'author_time': self.author_time.tobytes(),
+            'author_tz': self.author_tz.tobytes(),
+            'committer_time': self.committer_time.tobytes(),
+            'subject': self.subject,
+            'x': self.x.tobytes(),
+            'x2': self.x2.tobytes(),
+            'color': self.color.tobytes(),
+            'branch': self.branch.tobytes(),
+            'palette': self.palette,
+            'shift': self.shift,
+            'sha_size': self.sha_size,
+        }
+
+    @classmethod
+    def load(cls, data: dict) -> 'CommitTable':
+        table = cls()
+        table._sha = bytearray(data['sha'])
+        table._parent_start = array('q', data['parent_start'])
+        table._parent_sha = bytearray(data['parent_sha'])
+        table._parent = array('q', data['parent'])
+        table._authors = data['authors']
+        table.author = array('i', data['author'])
+        table.author_time = array('q', data['author_time'])
+        table.author_tz = array('h', data['author_tz'])
+        table.committer_time = array('q', data['committer_time'])
+        table.subject = data['subject']
+        table.x = array('i', data['x'])
+        table.x2 = array('i', data['x2'])
+        table.color = array('i', data['color'])
+        table.branch = array('i', data['branch'])
+        table.palette = data['palette']
+        table.shift = data['shift']
+        table.sha_size = size = data['sha_size']
+        table._rows = {table.sha_bytes(y): y - table.shift for y in range(len(table))}
+        table._author_ids = {author: i for i, author in enumerate(table._authors)}
+        for pos, row in enumerate(table._parent):
+            if row < 0:
+                table._pending[bytes(table._parent_sha[pos * size:(pos + 1) * size])].append(pos)
+        return table
+
+class CommitRow:
+    """
+    lightweight view of one row of CommitTable with attributes of Commit
+    """
+    __slots__ = ('_table', 'y')
+
+    def __init__(self, table: CommitTable, y: int):
+        self._table = table
+        self.y = y
+
+    @property
+    def sha(self):
+        return self._table.sha(self.y)
+
+    @property
+    def parent(self):
+        return [sha.hex() for sha in self._table.parent_shas(self.y)]
+
+    @property
+    def author(self):
+        return self._table.author_name(self.y)
+
+    @property
+    def author_date(self):
+        return git_datetime(self._table.author_time[self.y], self._table.author_tz[self.y])
+
+    @property
+    def committer_date(self):
+        return git_datetime(self._table.committer_time[self.y], 0)
+
+    @property
+    def message_oneline(self):
+        return self._table.subject[self.y]
+
+    @property
+    def x(self):
+        return self._table.x[self.y]
+
+    @property
+    def x2(self):
+        return self._table.x2[self.y]
+
+    @property
+    def color(self):
+        return self._table.color_name(self.y)
+
+    @property
+    def branch(self):
+        return self._table.branch[self.y]
+
+    def p(self):
+        return self.x, self.y
+
+    def p2(self):
+        return self.x2, self.y
+
+    def p0(self):
+        return 0, self.y
+
+    def __repr__(self):
+        return "CommitRow(p={}, sha={}, message={}, )".format(self.p(), self.sha, self.message_oneline)
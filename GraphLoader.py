@@ -0,0 +1,189 @@
+from PyQt5 import QtCore
+from gitgraph import iter_log, get_tips, LaneLayout, WindowColors, set_colors, stub_paths
+from graphcache import load_cached_graph, write_cache
+from CommitTable import CommitTable
+import threading
+import time
+import tracing
+
+FIRST_CHUNK_SIZE = 256
+MAX_CHUNK_SIZE = 8192
+WINDOW_SIZE = 2000
+
+class GraphLoader(QtCore.QThread):
+    """
+    streams commits from git log and lays them out in chunks on a worker thread,
+    colors are assigned once the whole history is loaded,
+    layout is read from the cache when refs did not move (or only moved forward) since the last load,
+    in windowed mode only window newest commits (or commits newer than since) are laid out
+    and every next window is laid out when fetchMore is called, rows are colored as they are laid out
+    """
+
+    chunkLoaded = QtCore.pyqtSignal(object, int, object, object)
+    colorsChanged = QtCore.pyqtSignal()
+
+    def __init__(self, repo, window = None, since = None, parent = None):
+        super().__init__(parent)
+        self._repo = repo
+        self._window = window
+        self._since = since
+        self._cancelled = False
+        self._more = threading.Event()
+        self._shown = threading.Event()
+        self.commits = CommitTable()
+        self.paths = []
+        self.occupancy = None
+        self.tips = []
+
+    def cancel(self):
+        self._cancelled = True
+        self._more.set()
+        self._shown.set()
+
+    def chunkShown(self):
+        """
+        called by gui when it is done with chunk, cached chunks are emitted one by one so gui can paint in between
+        """
+        self._shown.set()
+
+    def isWindowed(self):
+        return self._window is not None or self._since is not None
+
+    def fetchMore(self):
+        """
+        lays out next window in windowed mode, requests made while window is being laid out are dropped
+        """
+        self._more.set()
+
+    def _emitChunk(self, paths, stubs = None, count = None):
+        """
+        emits table, number of rows laid out so far (count), paths completed since previous chunk
+        and open-ended paths to parents below last row (replacing previous ones)
+        """
+        self.paths.extend(paths)
+        self.chunkLoaded.emit(self.commits, len(self.commits) if count is None else count, paths, stubs or [])
+
+    def _emitCached(self, commits: CommitTable, paths, occupancy) -> bool:
+        """
+        emits cached table in growing chunks like streamed one so gui measures and indexes rows in pieces,
+        returns False if cancelled
+        """
+        self.commits = commits
+        paths = sorted(paths, key = lambda path: path._parent)
+        shift = commits.shift
+        count = len(commits)
+        chunk_size = FIRST_CHUNK_SIZE
+        end = 0
+        i = 0
+        while end < count:
+            if self._cancelled:
+                return False
+            end = min(end + chunk_size, count)
+            j = i
+            while j < len(paths) and paths[j]._parent + shift < end:
+                j += 1
+            self._shown.clear()
+            self._emitChunk(paths[i:j], count = end)
+            self._shown.wait()
+            i = j
+            chunk_size = min(chunk_size * 2, MAX_CHUNK_SIZE)
+        self.occupancy = occupancy
+        return True
+
+    def run(self):
+        t1 = time.perf_counter()
+        tips = get_tips(self._repo)
+        if len(tips) == 0:
+            return
+        if self.isWindowed():
+            self._runWindowed(tips, t1)
+            return
+        cached = load_cached_graph(self._repo, tips)
+        if cached is not None:
+            if not self._emitCached(*cached):
+                return
+            self.tips = tips
+            self.colorsChanged.emit()
+            tracing.add('get graph', t1, time.perf_counter() - t1, rows = len(self.commits), cached = True)
+            return
+
+        commits = self.commits
+        layout = LaneLayout()
+        log = iter_log(self._repo, tips)
+        chunk_size = FIRST_CHUNK_SIZE
+        chunk_start = 0
+        chunk_time = time.perf_counter()
+        layout_time = 0.0
+        paths = []
+        try:
+            for record in log:
+                if self._cancelled:
+                    return
+                start = time.perf_counter()
+                y = commits.append(*record)
+                paths.extend(layout.add(commits, y))
+                layout_time += time.perf_counter() - start
+                if y + 1 - chunk_start >= chunk_size:
+                    if chunk_start == 0:
+                        tracing.add('first rows', t1, time.perf_counter() - t1, rows = y + 1)
+                    tracing.add('layout', chunk_time, layout_time, rows = y + 1 - chunk_start)
+                    chunk_time = time.perf_counter()
+                    layout_time = 0.0
+                    self._emitChunk(paths)
+                    chunk_start = y + 1
+                    paths = []
+                    chunk_size = min(chunk_size * 2, MAX_CHUNK_SIZE)
+        finally:
+            log.close()
+        tracing.add('layout', chunk_time, layout_time, rows = len(commits) - chunk_start)
+        self._emitChunk(paths)
+        self.occupancy = layout.occupancy
+        self.tips = tips
+        set_colors(self.commits, self.paths)
+        self.colorsChanged.emit()
+        write_cache(self._repo, tips, self.commits, self.paths, layout.occupancy)
+        tracing.add('get graph', t1, time.perf_counter() - t1, rows = len(self.commits), cached = False)
+
+    def _runWindowed(self, tips, t1):
+        self.tips = tips
+        commits = self.commits
+        layout = LaneLayout()
+        colors = WindowColors()
+        log = iter_log(self._repo, tips)
+        window = self._window or WINDOW_SIZE
+        end = self._window
+        since = self._since
+        window_start = 0
+        window_time = time.perf_counter()
+        paths = []
+        try:
+            for record in log:
+                if self._cancelled:
+                    return
+                full = end is not None and len(commits) >= end
+                if since is not None and record[5] < since and len(commits) > 0:
+                    full = True
+                if full:
+                    tracing.add('load window', window_time, time.perf_counter() - window_time, rows = len(commits) - window_start)
+                    if window_start == 0:
+                        tracing.add('first rows', t1, time.perf_counter() - t1, rows = len(commits))
+                    self._more.clear()
+                    self._emitChunk(paths, stub_paths(commits, layout, colors))
+                    paths = []
+                    self._more.wait()
+                    if self._cancelled:
+                        return
+                    window_start = len(commits)
+                    window_time = time.perf_counter()
+                    end = window_start + window
+                    since = None
+                y = commits.append(*record)
+                new_paths = layout.add(commits, y)
+                colors.add(commits, y, new_paths)
+                paths.extend(new_paths)
+        finally:
+            log.close()
+        tracing.add('load window', window_time, time.perf_counter() - window_time, rows = len(commits) - window_start)
+        self._emitChunk(paths)
+        self.occupancy = layout.occupancy
+        tracing.add('get graph (windowed)', t1, time.perf_counter() - t1, rows = len(commits))
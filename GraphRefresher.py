@@ -0,0 +1,47 @@
+from PyQt5 import QtCore
+from gitgraph import get_tips, get_log, prepend_commits, set_colors
+from graphcache import is_history_kept
+from CommitTable import CommitTable
+from Occupancy import Occupancy
+import tracing
+
+class GraphRefresher(QtCore.QThread):
+    """
+    finds out which ref tips moved since tips were loaded, reads commits that are new since then,
+    lays them out on top of shown graph and colors combined graph on a worker thread,
+    shown table is not changed (combined table is new), occupancy is updated in place and colors of shown paths
+    are assigned again like GraphLoader does, gui only puts new rows and paths on top,
+    without graph (windowed history that is laid out top-down) tips are only compared and tipsChanged is emitted when they moved
+    """
+
+    refreshed = QtCore.pyqtSignal(object, object, int, object)
+    historyRewritten = QtCore.pyqtSignal()
+    tipsChanged = QtCore.pyqtSignal(object)
+
+    def __init__(self, repo, tips, commits: CommitTable | None = None, paths = None, occupancy: Occupancy | None = None, parent = None):
+        super().__init__(parent)
+        self._repo = repo
+        self._tips = tips
+        self._commits = commits
+        self._paths = paths
+        self._occupancy = occupancy
+
+    def run(self):
+        tips = get_tips(self._repo)
+        if tips == self._tips:
+            return
+        if self._commits is None:
+            self.tipsChanged.emit(tips)
+            return
+        if len(tips) == 0 or not is_history_kept(self._repo, self._tips, tips):
+            self.historyRewritten.emit()
+            return
+        new_commits = get_log(self._repo, tips + ['^' + sha for sha in self._tips])
+        count = len(new_commits)
+        if count == 0:
+            self.refreshed.emit(tips, self._commits, 0, [])
+            return
+        with tracing.span('prepend commits', rows = count):
+            commits, paths = prepend_commits(self._commits, self._occupancy, new_commits)
+        set_colors(commits, paths + self._paths)
+        self.refreshed.emit(tips, commits, count, paths)
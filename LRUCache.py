@@ -0,0 +1,74 @@
+from collections import OrderedDict
+import threading
+
+class LRUCache:
+    """
+    mapping that evicts least recently used items when total cost of items exceeds max_cost
+    """
+    def __init__(self, max_cost):
+        self._items = OrderedDict()
+        self._cost = 0
+        self._max_cost = max_cost
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def cost(self):
+        return self._cost
+
+    def max_cost(self):
+        return self._max_cost
+
+    def set_max_cost(self, max_cost):
+        with self._lock:
+            self._max_cost = max_cost
+            self._evict()
+
+    def get(self, key, default = None):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return default
+            self._items.move_to_end(key)
+            return item[0]
+
+    def put(self, key, value, cost):
+        """
+        items that cost more than max_cost are not stored
+        """
+        with self._lock:
+            self._pop(key)
+            if cost > self._max_cost:
+                return
+            self._items[key] = (value, cost)
+            self._cost += cost
+            self._evict()
+
+    def pop(self, key):
+        with self._lock:
+            return self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._cost = 0
+
+    def keys(self):
+        with self._lock:
+            return list(self._items.keys())
+
+    def _pop(self, key):
+        item = self._items.pop(key, None)
+        if item is None:
+            return
+        self._cost -= item[1]
+        return item[0]
+
+    def _evict(self):
+        while self._cost > self._max_cost and len(self._items) > 0:
+            key, (value, cost) = self._items.popitem(last=False)
+            self._cost -= cost
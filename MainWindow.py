@@ -1,10 +1,28 @@
 from PyQt5 import QtWidgets, QtGui, QtCore
 from Ui_MainWindow import Ui_MainWindow
-from CommitGraphWidget import CommitGraphWidget
-import os
-from gitexec import execute
-from gitgraph import get_graph
-import time
+from CommitGraphWidget import CommitGraphWidget, ROW_HEIGHT
+from GraphLoader import GraphLoader
+from GraphRefresher import GraphRefresher
+from RepoWatcher import RepoWatcher
+from CommitTable import CommitTable
+from ObjectReader import ObjectReader
+from TreeModel import TreeModel, TreeListings
+from TreeLoader import TreeLoader
+from Prefetcher import Prefetcher, PREFETCH_DISTANCE
+from SearchIndex import SearchIndex
+from bisect import bisect_left, bisect_right
+from BlobFile import BlobFile
+from BlobView import BlobView
+from TreeExporter import TreeExporter
+from TraceHud import TraceHud
+from gitexec import git_dir
+import tracing
+
+LARGE_FILE_SIZE = 4 * 1024 * 1024
+SELECTION_DEBOUNCE_INTERVAL = 100
+PREFETCH_DELAY = 200
+SEARCH_INDEX_SLICE = 5000
+FETCH_MARGIN_PAGES = 2
 
 class MainWindow(QtWidgets.QMainWindow):
     def __init__(self):
@@ -13,16 +31,59 @@ class MainWindow(QtWidgets.QMainWindow):
         ui.setupUi(self)
         self._ui = ui
         self._repo = None
+        self._loader = None
+        self._objects = None
+        self._trees = None
+        self._treeLoader = None
+        self._pendingCommit = None
+        self._prefetcher = None
+        self._cacheCost = None
+        self._openPath = None
+        self._search = None
+        self._searchCount = 0
+        self._window = None
+        self._since = None
+        self._exporter = None
+        self._watcher = None
+        self._refresher = None
+        self._refreshPending = False
+        self._tips = None
+        self._occupancy = None
+        self._restore = None
         ui.openRepository.triggered.connect(self.onOpenRepository)
         ui.save.clicked.connect(self.onSave)
+        ui.exportFiles.clicked.connect(self.onExport)
         ui.prevCommit.clicked.connect(self.onPrevCommit)
         ui.nextCommit.clicked.connect(self.onNextCommit)
+        ui.search.textChanged.connect(self.onSearchChanged)
+        ui.search.returnPressed.connect(self.onNextMatch)
+        ui.nextMatch.clicked.connect(self.onNextMatch)
+        ui.prevMatch.clicked.connect(self.onPrevMatch)
         graph = CommitGraphWidget()
         self.graph = graph
 
+        blobView = BlobView(ui.fileGroup)
+        blobView.setFont(ui.file.font())
+        blobView.hide()
+        ui.verticalLayout_4.insertWidget(ui.verticalLayout_4.indexOf(ui.file) + 1, blobView)
+        self._blobView = blobView
+
         ui.commits.setWidget(graph)
         ui.commits.setWidgetResizable(False)
+        ui.commits.verticalScrollBar().valueChanged.connect(self.onCommitsScrolled)
+        ui.commits.verticalScrollBar().rangeChanged.connect(self.onCommitsScrolled)
         graph.currentChanged.connect(self.onCommitChanged)
+        self._selectionTimer = QtCore.QTimer(self)
+        self._selectionTimer.setSingleShot(True)
+        self._selectionTimer.setInterval(SELECTION_DEBOUNCE_INTERVAL)
+        self._selectionTimer.timeout.connect(self.onSelectionSettled)
+        self._prefetchTimer = QtCore.QTimer(self)
+        self._prefetchTimer.setSingleShot(True)
+        self._prefetchTimer.setInterval(PREFETCH_DELAY)
+        self._prefetchTimer.timeout.connect(self.onPrefetch)
+        self._indexTimer = QtCore.QTimer(self)
+        self._indexTimer.setSingleShot(True)
+        self._indexTimer.timeout.connect(self.onIndexSlice)
         ui.showDate.clicked.connect(self.onShowDate)
         ui.showTime.clicked.connect(self.onShowTime)
         ui.showAuthor.clicked.connect(self.onShowAuthor)
@@ -35,6 +96,53 @@ class MainWindow(QtWidgets.QMainWindow):
 
         QtCore.QTimer.singleShot(0, adjustSplitters)
 
+        self._hud = TraceHud(ui.centralwidget)
+        shortcut = QtWidgets.QShortcut(QtGui.QKeySequence("F12"), self)
+        shortcut.activated.connect(self.onToggleHud)
+        shortcut = QtWidgets.QShortcut(QtGui.QKeySequence(QtGui.QKeySequence.StandardKey.Find), self)
+        shortcut.activated.connect(self.onFocusSearch)
+        shortcut = QtWidgets.QShortcut(QtGui.QKeySequence(QtGui.QKeySequence.StandardKey.FindNext), self)
+        shortcut.activated.connect(self.onNextMatch)
+        shortcut = QtWidgets.QShortcut(QtGui.QKeySequence(QtGui.QKeySequence.StandardKey.FindPrevious), self)
+        shortcut.activated.connect(self.onPrevMatch)
+
+    def setWindow(self, window, since = None):
+        """
+        loads only window newest commits (or commits newer than since, unix time) when repository is opened
+        and next windows when commits are scrolled near the end, None for both loads whole history
+        """
+        self._window = window
+        self._since = since
+
+    def onToggleHud(self):
+        self.setHudVisible(not self._hud.isVisible())
+
+    def setHudVisible(self, visible):
+        """
+        shows timing spans overlay (also toggled with F12)
+        """
+        self._hud.setVisible(visible)
+
+    def closeEvent(self, event):
+        if self._loader is not None:
+            self._loader.cancel()
+            self._loader.wait()
+        if self._refresher is not None:
+            self._refresher.wait()
+        if self._exporter is not None:
+            self._exporter.cancel()
+            self._exporter.wait()
+        self._selectionTimer.stop()
+        self._prefetchTimer.stop()
+        if self._treeLoader is not None:
+            self._treeLoader.shutdown()
+        if self._prefetcher is not None:
+            self._prefetcher.shutdown()
+        if self._objects is not None:
+            self._objects.close()
+        self._blobView.setBlob(None)
+        super().closeEvent(event)
+
     def onShowDate(self, value):
         self.graph.setShowDate(value)
 
@@ -50,6 +158,66 @@ class MainWindow(QtWidgets.QMainWindow):
     def onNextCommit(self):
         self.graph.selectNext()
 
+    def onFocusSearch(self):
+        self._ui.search.setFocus()
+        self._ui.search.selectAll()
+
+    def onSearchChanged(self, text):
+        self._updateMatches()
+
+    def _updateMatches(self):
+        """
+        highlights rows matching search query
+        """
+        ui = self._ui
+        query = ui.search.text()
+        if self._search is None or query.strip() == "":
+            self.graph.setMatches([])
+            ui.matches.clear()
+            return
+        with tracing.span('search'):
+            rows = self._search.search(query)
+        self.graph.setMatches(rows)
+        self._showMatchCount()
+
+    def _showMatchCount(self):
+        rows = self.graph.matches()
+        y = self.graph.currentIndex()
+        i = bisect_left(rows, y) if y is not None else len(rows)
+        if i < len(rows) and rows[i] == y:
+            self._ui.matches.setText("{}/{}".format(i + 1, len(rows)))
+        else:
+            self._ui.matches.setText("{} matches".format(len(rows)))
+
+    def _selectMatch(self, y):
+        graph = self.graph
+        graph.selectIndex(y)
+        scrollArea = self._ui.commits
+        scrollArea.ensureVisible(scrollArea.horizontalScrollBar().value(), int(graph.rowCenter(y).y()), 0, ROW_HEIGHT * 3)
+        self._showMatchCount()
+
+    def onNextMatch(self):
+        """
+        selects first match below selection, wraps around
+        """
+        rows = self.graph.matches()
+        if len(rows) == 0:
+            return
+        y = self.graph.currentIndex()
+        i = 0 if y is None else bisect_right(rows, y)
+        self._selectMatch(rows[i % len(rows)])
+
+    def onPrevMatch(self):
+        """
+        selects first match above selection, wraps around
+        """
+        rows = self.graph.matches()
+        if len(rows) == 0:
+            return
+        y = self.graph.currentIndex()
+        i = len(rows) if y is None else bisect_left(rows, y)
+        self._selectMatch(rows[(i - 1) % len(rows)])
+
     def openRepository(self, path):
         self._repo = path
         self.onRepoChanged()
@@ -64,77 +232,389 @@ class MainWindow(QtWidgets.QMainWindow):
         repo = self._repo
         if repo is None:
             return
-        t1 = time.time()
-        commits, paths = get_graph(repo)
-        t2 = time.time()
-        print("get_graph took {:.3f} s".format(t2 - t1))
-        self.graph.init(commits, paths)
+        if self._loader is not None:
+            self._loader.cancel()
+        self._restore = None
+        self._selectionTimer.stop()
+        self._prefetchTimer.stop()
+        self._pendingCommit = None
+        self._openPath = None
+        if self._treeLoader is not None:
+            self._treeLoader.shutdown()
+            self._treeLoader.deleteLater()
+        if self._prefetcher is not None:
+            self._prefetcher.shutdown()
+        if self._objects is not None:
+            self._objects.close()
+        self._objects = ObjectReader(repo) if self._cacheCost is None else ObjectReader(repo, self._cacheCost)
+        self._trees = TreeListings(repo)
+        self._treeLoader = TreeLoader(self._objects, self._trees, self)
+        self._treeLoader.loaded.connect(self.onTreeLoaded)
+        self._prefetcher = Prefetcher(self._objects, self._trees)
+        ui = self._ui
+        old = ui.files.model()
+        ui.files.setModel(TreeModel(self._trees, None, self))
+        if old is not None:
+            old.deleteLater()
+        ui.files.selectionModel().currentChanged.connect(self.onCurrentFileChanged)
+        ui.groupBox_2.setTitle("Files")
+        ui.groupBox_2.setToolTip("")
+        if self._refresher is not None:
+            self._refresher.wait()
+            self._refresher = None
+        self._tips = None
+        self._occupancy = None
+        self._refreshPending = False
+        if self._watcher is not None:
+            self._watcher.deleteLater()
+        self._watcher = RepoWatcher(git_dir(repo), self)
+        self._watcher.refsChanged.connect(self.onRefsChanged)
+        self.graph.init(CommitTable(), [])
+        self._search = None
+        self._searchCount = 0
+        self._indexTimer.stop()
+        ui.matches.clear()
+        loader = GraphLoader(repo, self._window, self._since, self)
+        loader.chunkLoaded.connect(self.onGraphChunkLoaded)
+        loader.colorsChanged.connect(self.onGraphColorsChanged)
+        loader.finished.connect(self.onGraphLoaded)
+        self._loader = loader
+        loader.start()
+
+    def onGraphLoaded(self):
+        loader = self.sender()
+        loader.deleteLater()
+        if loader is not self._loader:
+            return
+        self._loader = None
+        if self._restore is not None:
+            self._restoreView(True)
+        if loader.occupancy is None:
+            return
+        self._tips = loader.tips
+        self._occupancy = loader.occupancy
+        if self._refreshPending:
+            self.onRefsChanged()
+
+    def onRefsChanged(self):
+        """
+        reads commits added since graph was loaded and puts them on top of it,
+        in windowed mode newest window is loaded again if ref tips moved (watcher also reports index lock churn)
+        """
+        if self._refresher is not None:
+            self._refreshPending = True
+            return
+        if self._window is not None or self._since is not None:
+            tips = self._tips if self._loader is None else self._loader.tips
+            if not tips:
+                self._reloadWindowed()
+                return
+            self._refreshPending = False
+            refresher = GraphRefresher(self._repo, tips, parent = self)
+            refresher.tipsChanged.connect(self.onTipsChanged)
+            refresher.finished.connect(self.onRefreshFinished)
+            self._refresher = refresher
+            refresher.start()
+            return
+        if self._occupancy is None:
+            if self._loader is None:
+                # nothing was loaded (repo had no commits)
+                self.onRepoChanged()
+                return
+            self._refreshPending = True
+            return
+        self._refreshPending = False
+        graph = self.graph
+        refresher = GraphRefresher(self._repo, self._tips, graph.commits, graph.paths, self._occupancy, self)
+        refresher.refreshed.connect(self.onGraphRefreshed)
+        refresher.historyRewritten.connect(self.onHistoryRewritten)
+        refresher.finished.connect(self.onRefreshFinished)
+        self._refresher = refresher
+        refresher.start()
+
+    def onHistoryRewritten(self):
+        if self.sender() is self._refresher:
+            self.onRepoChanged()
+
+    def onTipsChanged(self, tips):
+        if self.sender() is self._refresher:
+            self._reloadWindowed()
+
+    def _reloadWindowed(self):
+        """
+        loads windowed history again, as many rows as were loaded are laid out again (new commits move them down),
+        then selection and scroll offset are restored
+        """
+        graph = self.graph
+        restore = (graph.selected(), graph.currentIndex(), self._ui.commits.verticalScrollBar().value(), graph.count())
+        self.onRepoChanged()
+        self._restore = restore
+
+    def _restoreView(self, done):
+        """
+        asks loader for next window until rows that were shown before reload are laid out again
+        """
+        sha, row, value, count = self._restore
+        graph = self.graph
+        if graph.count() < count and not done:
+            self._loader.fetchMore()
+            return
+        self._restore = None
+        y = None if sha is None else graph.currentIndex()
+        if y is not None and row is not None:
+            value += (y - row) * ROW_HEIGHT
+        self._ui.commits.verticalScrollBar().setValue(value)
+        if y is not None:
+            graph.update()
+            self.onCommitChanged(sha)
+
+    def onRefreshFinished(self):
+        refresher = self.sender()
+        refresher.deleteLater()
+        if refresher is not self._refresher:
+            return
+        self._refresher = None
+        if self._refreshPending:
+            self.onRefsChanged()
+
+    def onGraphRefreshed(self, tips, commits, count, paths):
+        """
+        puts rows laid out by refresher on top, work done here depends only on number of new rows
+        """
+        if self.sender() is not self._refresher or self._occupancy is None:
+            return
+        self._tips = tips
+        if count == 0:
+            return
+        graph = self.graph
+        scrollBar = self._ui.commits.verticalScrollBar()
+        value = scrollBar.value()
+        graph.prependCommits(commits, count, paths)
+        if value > 0:
+            scrollBar.setValue(value + count * ROW_HEIGHT)
+        if self._search is not None:
+            self._search.prepend(commits, count)
+            self._searchCount += count
+            self._updateMatches()
+
+    def onGraphChunkLoaded(self, commits, count, paths, stubs):
+        if self.sender() is not self._loader:
+            return
+        if self.graph.commits is not commits:
+            self.graph.init(commits, paths, count)
+            self._search = SearchIndex(commits)
+        else:
+            self.graph.appendCommits(count, paths)
+        self.graph.setStubs(stubs)
+        self._loader.chunkShown()
+        self._searchCount = count
+        self._indexTimer.start()
+        if self._restore is not None:
+            self._restoreView(False)
+
+    def onIndexSlice(self):
+        """
+        indexes loaded rows for search in slices to keep gui responsive
+        """
+        search = self._search
+        if search is None:
+            return
+        count = min(self._searchCount, len(search) + SEARCH_INDEX_SLICE)
+        with tracing.span('search index', rows = count - len(search)):
+            search.update(count)
+        self._updateMatches()
+        if len(search) < self._searchCount:
+            self._indexTimer.start()
+
+    def onCommitsScrolled(self):
+        """
+        asks windowed loader for next window when less than FETCH_MARGIN_PAGES pages are left below
+        """
+        loader = self._loader
+        if loader is None or not loader.isWindowed() or not loader.isRunning():
+            return
+        scrollBar = self._ui.commits.verticalScrollBar()
+        if scrollBar.maximum() - scrollBar.value() <= scrollBar.pageStep() * FETCH_MARGIN_PAGES:
+            loader.fetchMore()
+
+    def onGraphColorsChanged(self):
+        if self.sender() is not self._loader:
+            return
+        self.graph.invalidateTiles()
 
     def onCommitChanged(self, commit):
-        #print('onCommitChanged', index.data())
-        repo = self._repo
-        if repo is None:
+        """
+        selection is applied after it settles down, tree of commit is read in background
+        """
+        if self._repo is None:
+            return
+        self._pendingCommit = commit
+        self._prefetchTimer.stop()
+        if self._prefetcher is not None:
+            self._prefetcher.cancel()
+        self._selectionTimer.start()
+
+    def onSelectionSettled(self):
+        commit = self._pendingCommit
+        if commit is None or self._treeLoader is None:
+            return
+        self._treeLoader.load(commit)
+
+    def onTreeLoaded(self, generation, commit, tree, details):
+        if self.sender() is not self._treeLoader or generation != self._treeLoader.generation():
             return
-        
         ui = self._ui
+        with tracing.span('tree model'):
+            ui.files.model().setTree(tree)
+        ui.groupBox_2.setTitle("Files of {} {}".format(commit[:8], details.message_oneline))
+        tooltip = [details.sha, "{} {}".format(details.author, details.author_date.isoformat(' ')), ""] + details.message
+        if len(details.gpgsig) > 0:
+            tooltip += ["", "signed"]
+        ui.groupBox_2.setToolTip('\n'.join(tooltip))
+        if self._openPath is not None:
+            self._reopenFile(self._openPath)
+        self._prefetchTimer.start()
 
-        def split(line):
-            cols = line.split('\t')
-            if (len(cols) == 2):
-                cols_ = cols[0].split(' ')
-                if len(cols_) == 3:
-                    hash = cols_[2]
-                    name = cols[1]
-                    return [hash, name]
-                
-        def filter_none(vs):
-            return [v for v in vs if v is not None]
-
-        lines = execute(['git','ls-tree','-r', commit], cwd=repo)
-        data = filter_none([split(line) for line in lines])
-        
-        model = QtGui.QStandardItemModel(len(data), 2)
-
-        for row, (hash, name) in enumerate(data):
-            model.setData(model.index(row, 0), hash)
-            model.setData(model.index(row, 1), name)
-
-        ui.files.setModel(model)
-        ui.files.setModelColumn(1)
+    def _reopenFile(self, path):
+        """
+        shows file that was open in previous commit if it exists in this one
+        """
+        ui = self._ui
+        model: TreeModel = ui.files.model()
+        index = model.findPath(path)
+        if not model.isFile(index):
+            self._showText('')
+            ui.fileGroup.setTitle("File")
+            return
+        parent = index.parent()
+        while parent.isValid():
+            ui.files.expand(parent)
+            parent = parent.parent()
+        ui.files.setCurrentIndex(index)
 
-        ui.files.selectionModel().currentChanged.connect(self.onCurrentFileChanged)
+    def onPrefetch(self):
+        """
+        warms caches with commits around selection and open file in them, closest first
+        """
+        y = self.graph.currentIndex()
+        if y is None or self._prefetcher is None:
+            return
+        count = self.graph.count()
+        rows = []
+        for distance in range(1, PREFETCH_DISTANCE + 1):
+            rows += [row for row in (y - distance, y + distance) if 0 <= row < count]
+        self._prefetcher.prefetch([self.graph.commits.sha(row) for row in rows], self._openPath)
+
+    def setCacheSize(self, size):
+        """
+        sets memory cap (bytes) of object cache that is also filled by prefetching
+        """
+        self._cacheCost = size
+        if self._objects is not None:
+            self._objects.set_cache_cost(size)
 
     def _file(self, index, binary=False):
         repo = self._repo
         if repo is None:
             return
         ui = self._ui
-        model = ui.files.model()
-        hash = model.data(model.index(index.row(), 0))
-        output = execute(['git','show', hash], cwd=repo, split=False, octescape=False, binary=binary)
-        return output
+        model: TreeModel = ui.files.model()
+        if not model.isFile(index):
+            return
+        output = self._objects.read(model.oid(index))
+        if binary:
+            return output
+        try:
+            return output.decode('utf-8')
+        except UnicodeDecodeError:
+            return output
 
     def onCurrentFileChanged(self, index):
         ui = self._ui
-        output = self._file(index, binary=False)
-        if output is None:
+        model: TreeModel = ui.files.model()
+        if not model.isFile(index):
             return
-        if isinstance(output, bytes):
-            ui.file.setPlainText('binary file')
+        _, size = self._objects.info(model.oid(index))
+        if size > LARGE_FILE_SIZE:
+            self._showLargeFile(model.oid(index))
         else:
-            ui.file.setPlainText(output)
-        path = ui.files.currentIndex().data()
+            output = self._file(index, binary=False)
+            if output is None:
+                return
+            self._showText('binary file' if isinstance(output, bytes) else output)
+        path = model.path(index)
         ui.fileGroup.setTitle("File " + path)
+        self._openPath = path
+
+    def _showText(self, text):
+        ui = self._ui
+        self._blobView.setBlob(None)
+        self._blobView.hide()
+        ui.file.setPlainText(text)
+        ui.file.show()
+
+    def _showLargeFile(self, oid):
+        """
+        streams blob to disk and shows it in virtualized view
+        """
+        ui = self._ui
+        blob = BlobFile(self._repo, oid)
+        if blob.binary:
+            blob.close()
+            self._showText('binary file')
+            return
+        ui.file.clear()
+        ui.file.hide()
+        self._blobView.setBlob(blob)
+        self._blobView.show()
 
     def onSave(self):
         ui = self._ui
-        path = ui.files.currentIndex().data()
-        name = os.path.basename(path)
+        model: TreeModel = ui.files.model()
+        if model is None or not model.isFile(ui.files.currentIndex()):
+            return
+        name = model.data(ui.files.currentIndex())
         path, _ = QtWidgets.QFileDialog.getSaveFileName(self,None,name)
         if path == "":
             return
-        output = self._file(ui.files.currentIndex(), binary=True)
-        if output is None:
-            return
         with open(path, "wb") as f:
-            f.write(output)
+            self._objects.copy(model.oid(ui.files.currentIndex()), f)
+
+    def onExport(self):
+        """
+        exports selected directory or whole commit if no directory is selected
+        """
+        ui = self._ui
+        model: TreeModel = ui.files.model()
+        if model is None or self._exporter is not None:
+            return
+        index = ui.files.currentIndex()
+        tree = model.oid(index) if model.isDir(index) else model.tree()
+        if tree is None:
+            # no commit is shown yet
+            return
+        dest = QtWidgets.QFileDialog.getExistingDirectory(self)
+        if dest == "":
+            return
+        dialog = QtWidgets.QProgressDialog("Exporting files", "Cancel", 0, 0, self)
+        dialog.setMinimumDuration(500)
+        exporter = TreeExporter(self._repo, tree, dest, self)
+
+        def onProgress(done, total):
+            dialog.setMaximum(total)
+            dialog.setValue(done)
+
+        def onFailed(message):
+            QtWidgets.QMessageBox.warning(self, "Export", message)
+
+        def onFinished():
+            dialog.close()
+            exporter.deleteLater()
+            self._exporter = None
+
+        exporter.progress.connect(onProgress)
+        exporter.failed.connect(onFailed)
+        exporter.finished.connect(onFinished)
+        dialog.canceled.connect(exporter.cancel)
+        self._exporter = exporter
+        exporter.start()
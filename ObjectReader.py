@@ -0,0 +1,137 @@
+from LRUCache import LRUCache
+import subprocess
+import threading
+import tracing
+
+BLOB_CACHE_COST = 32 * 1024 * 1024
+COPY_CHUNK_SIZE = 1024 * 1024
+
+class ObjectReader:
+    """
+    reads objects of one repo through long-lived git cat-file --batch and --batch-check processes,
+    requests from any thread are serialized, contents are kept in LRU cache keyed by object id
+    """
+    def __init__(self, repo, cache_cost = BLOB_CACHE_COST):
+        self._repo = repo
+        self._batch = None
+        self._check = None
+        self._batch_lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._cache = LRUCache(cache_cost)
+
+    def _start(self, arg):
+        return subprocess.Popen(['git', 'cat-file', arg], cwd = self._repo, stdin = subprocess.PIPE, stdout = subprocess.PIPE, stderr = subprocess.DEVNULL)
+
+    def _request(self, process, oid):
+        process.stdin.write(oid.encode('ascii') + b'\n')
+        process.stdin.flush()
+        header = process.stdout.readline()
+        if header == b'':
+            raise OSError('git cat-file exited')
+        cols = header.rstrip(b'\n').split(b' ')
+        if len(cols) != 3:
+            raise KeyError(oid)
+        return cols[1].decode('ascii'), int(cols[2])
+
+    def info(self, oid) -> tuple[str, int]:
+        """
+        returns type and size of object, raises KeyError if there is no such object
+        """
+        cached = self._cache.get(oid)
+        if cached is not None:
+            return cached[0], len(cached[1])
+        with self._check_lock:
+            if self._check is None:
+                self._check = self._start('--batch-check')
+            try:
+                return self._request(self._check, oid)
+            except (OSError, ValueError):
+                self._check = self._stop(self._check)
+                raise
+
+    def read_object(self, oid) -> tuple[str, bytes]:
+        """
+        returns type and contents of object, raises KeyError if there is no such object
+        """
+        cached = self._cache.get(oid)
+        if cached is not None:
+            return cached
+        with self._batch_lock:
+            if self._batch is None:
+                self._batch = self._start('--batch')
+            try:
+                with tracing.span('git cat-file'):
+                    type_, size = self._request(self._batch, oid)
+                    data = self._batch.stdout.read(size + 1)[:size]
+                if len(data) != size:
+                    raise OSError('git cat-file exited')
+            except (OSError, ValueError):
+                self._batch = self._stop(self._batch)
+                raise
+        self._cache.put(oid, (type_, data), size)
+        return type_, data
+
+    def read(self, oid) -> bytes:
+        """
+        returns contents of object
+        """
+        return self.read_object(oid)[1]
+
+    def copy(self, oid, f, chunk_size = COPY_CHUNK_SIZE) -> int:
+        """
+        writes contents of object to file object f in chunks without keeping it in memory, returns size
+        """
+        cached = self._cache.get(oid)
+        if cached is not None:
+            f.write(cached[1])
+            return len(cached[1])
+        with self._batch_lock:
+            if self._batch is None:
+                self._batch = self._start('--batch')
+            try:
+                _, size = self._request(self._batch, oid)
+                left = size
+                while left > 0:
+                    chunk = self._batch.stdout.read(min(left, chunk_size))
+                    if not chunk:
+                        raise OSError('git cat-file exited')
+                    f.write(chunk)
+                    left -= len(chunk)
+                self._batch.stdout.read(1)
+            except (OSError, ValueError):
+                self._batch = self._stop(self._batch)
+                raise
+        return size
+
+    def tree(self, commit) -> str:
+        """
+        returns oid of root tree of commit
+        """
+        header = self.read(commit).split(b'\n', 1)[0]
+        return header.split(b' ')[1].decode('ascii')
+
+    def cached(self, oid) -> bool:
+        return oid in self._cache
+
+    def cache_cost(self) -> int:
+        return self._cache.max_cost()
+
+    def set_cache_cost(self, cache_cost):
+        self._cache.set_max_cost(cache_cost)
+
+    def _stop(self, process):
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        process.kill()
+        process.wait()
+
+    def close(self):
+        with self._batch_lock:
+            self._batch = self._stop(self._batch)
+        with self._check_lock:
+            self._check = self._stop(self._check)
+        self._cache.clear()
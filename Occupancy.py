@@ -0,0 +1,95 @@
+BLOCK_ROWS = 64
+
+def lowest_free(mask):
+    return (~mask & (mask + 1)).bit_length() - 1
+
+class Occupancy:
+    """
+    occupied lanes of every row as integer bitmask (bit x is set if lane x is used in row y),
+    masks of BLOCK_ROWS consecutive rows are also or-ed together to answer span queries in bulk,
+    blocks are counted from the first row before rows were prepended (shift) so prepending does not regroup them
+    """
+    def __init__(self, rows = None):
+        self._rows = []
+        self._blocks = dict()
+        self._shift = 0
+        if rows is not None:
+            self.extend(rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def rows(self) -> list[int]:
+        return self._rows
+
+    def row(self, y) -> int:
+        return self._rows[y]
+
+    def append(self, mask):
+        block = (len(self._rows) - self._shift) // BLOCK_ROWS
+        self._rows.append(mask)
+        self._blocks[block] = self._blocks.get(block, 0) | mask
+
+    def extend(self, masks):
+        for mask in masks:
+            self.append(mask)
+
+    def prepend(self, masks):
+        """
+        puts rows on top, only blocks of new rows are computed
+        """
+        masks = list(masks)
+        self._rows = masks + self._rows
+        self._shift += len(masks)
+        blocks = self._blocks
+        for y, mask in enumerate(masks):
+            block = (y - self._shift) // BLOCK_ROWS
+            blocks[block] = blocks.get(block, 0) | mask
+
+    def mark(self, y1, y2, x):
+        """
+        marks lane x as used in rows y1 .. y2 - 1
+        """
+        if y1 >= y2:
+            return
+        bit = 1 << x
+        rows = self._rows
+        for y in range(y1, y2):
+            rows[y] |= bit
+        shift = self._shift
+        for block in range((y1 - shift) // BLOCK_ROWS, (y2 - 1 - shift) // BLOCK_ROWS + 1):
+            self._blocks[block] |= bit
+
+    def span(self, y1, y2) -> int:
+        """
+        lanes used in any of rows y1 .. y2 - 1
+        """
+        rows = self._rows
+        shift = self._shift
+        mask = 0
+        y = y1
+        while y < y2 and (y - shift) % BLOCK_ROWS != 0:
+            mask |= rows[y]
+            y += 1
+        while y + BLOCK_ROWS <= y2:
+            mask |= self._blocks[(y - shift) // BLOCK_ROWS]
+            y += BLOCK_ROWS
+        while y < y2:
+            mask |= rows[y]
+            y += 1
+        return mask
+
+    def free_lane(self, y1, y2, prefer = None) -> int:
+        """
+        lane that is free in all rows y1 .. y2 - 1, prefer is returned if it is free
+        """
+        mask = self.span(y1, y2)
+        if prefer is not None and (mask >> prefer) & 1 == 0:
+            return prefer
+        return lowest_free(mask)
+
+    def text_pos(self, y) -> int:
+        """
+        first lane right of every used lane in row y
+        """
+        return max(1, self._rows[y].bit_length())
@@ -0,0 +1,61 @@
+from ObjectReader import ObjectReader
+from TreeModel import TreeListings
+from gitexec import CancelToken, Cancelled
+from concurrent.futures import ThreadPoolExecutor
+import subprocess
+import tracing
+
+PREFETCH_DISTANCE = 4
+
+class Prefetcher:
+    """
+    warms caches of object reader and tree listings with commits around selection while gui is idle:
+    commit objects, root tree listings, listings of directories on open path and blob of open file,
+    blobs that would take more than max_blob_share of reader cache are not prefetched,
+    starting prefetch cancels previous one
+    """
+    def __init__(self, objects: ObjectReader, listings: TreeListings, max_blob_share = 0.25):
+        self._objects = objects
+        self._listings = listings
+        self._maxBlobShare = max_blob_share
+        self._executor = ThreadPoolExecutor(max_workers = 1)
+        self._token = None
+
+    def prefetch(self, commits, path = None):
+        """
+        commits are prefetched in given order (closest first)
+        """
+        self.cancel()
+        self._token = CancelToken()
+        self._executor.submit(self._prefetch, list(commits), path, self._token)
+
+    def cancel(self):
+        if self._token is not None:
+            self._token.cancel()
+            self._token = None
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait = True)
+
+    def _prefetch(self, commits, path, token: CancelToken):
+        objects = self._objects
+        for commit in commits:
+            if token.cancelled:
+                return
+            try:
+                with tracing.span('prefetch', commit = commit):
+                    tree = objects.tree(commit)
+                    self._listings.get(tree, token)
+                    if path is None:
+                        continue
+                    entry = self._listings.resolve(tree, path, token)
+                    if entry is None or entry[0] != 'blob' or objects.cached(entry[1]):
+                        continue
+                    _, size = objects.info(entry[1])
+                    if size <= objects.cache_cost() * self._maxBlobShare and not token.cancelled:
+                        objects.read(entry[1])
+            except Cancelled:
+                return
+            except (KeyError, OSError, subprocess.CalledProcessError):
+                continue
@@ -0,0 +1,49 @@
+from PyQt5 import QtCore
+import os
+
+DEBOUNCE_INTERVAL = 300
+
+class RepoWatcher(QtCore.QObject):
+    """
+    watches HEAD, refs, packed-refs and reflogs of repo, emits refsChanged once changes settle down
+    """
+
+    refsChanged = QtCore.pyqtSignal()
+
+    def __init__(self, git_dir, parent = None):
+        super().__init__(parent)
+        self._gitDir = git_dir
+        self._watcher = QtCore.QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self.onChanged)
+        self._watcher.directoryChanged.connect(self.onChanged)
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(DEBOUNCE_INTERVAL)
+        self._timer.timeout.connect(self.onTimeout)
+        self._watch()
+
+    def _paths(self):
+        git_dir = self._gitDir
+        paths = [git_dir, os.path.join(git_dir, 'HEAD'), os.path.join(git_dir, 'packed-refs')]
+        for name in ['refs', os.path.join('logs', 'refs')]:
+            for root, dirs, files in os.walk(os.path.join(git_dir, name)):
+                paths.append(root)
+        logs = os.path.join(git_dir, 'logs')
+        paths.extend([logs, os.path.join(logs, 'HEAD')])
+        return [path for path in paths if os.path.exists(path)]
+
+    def _watch(self):
+        """
+        (re)adds paths, git replaces ref files on update and creates directories for new refs
+        """
+        watched = set(self._watcher.files() + self._watcher.directories())
+        paths = [path for path in self._paths() if path not in watched]
+        if len(paths) > 0:
+            self._watcher.addPaths(paths)
+
+    def onChanged(self, path):
+        self._timer.start()
+
+    def onTimeout(self):
+        self._watch()
+        self.refsChanged.emit()
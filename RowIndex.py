@@ -0,0 +1,40 @@
+from collections import defaultdict
+
+BLOCK_ROWS = 64
+
+class RowIndex:
+    """
+    finds items (paths) that span given rows, every item is stored in each block of BLOCK_ROWS rows it touches,
+    blocks are counted from the first row before rows were put on top (shift) so items need not be moved
+    """
+    def __init__(self):
+        self._blocks = defaultdict(list)
+        self._items = []
+        self._shift = 0
+
+    def add(self, item, y1, y2):
+        i = len(self._items)
+        self._items.append(item)
+        shift = self._shift
+        for block in range((y1 - shift) // BLOCK_ROWS, (y2 - shift) // BLOCK_ROWS + 1):
+            self._blocks[block].append(i)
+
+    def prepend(self, count):
+        """
+        moves items added so far down by count rows
+        """
+        self._shift += count
+
+    def query(self, y1, y2):
+        """
+        items that may span rows y1 .. y2 (inclusive): all items of blocks covering these rows, in the order they were added
+        """
+        found = set()
+        shift = self._shift
+        for block in range((y1 - shift) // BLOCK_ROWS, (y2 - shift) // BLOCK_ROWS + 1):
+            found.update(self._blocks.get(block, []))
+        items = self._items
+        return [items[i] for i in sorted(found)]
+
+    def __len__(self):
+        return len(self._items)
@@ -0,0 +1,158 @@
+from CommitTable import CommitTable
+from LRUCache import LRUCache
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+import re
+
+TOKEN_RE = re.compile(r'\w+')
+SHA_PREFIX_RE = re.compile(r'[0-9a-f]{4,64}')
+SHA_BUCKET_SIZE = 2
+WORD_CACHE_SIZE = 256
+MIN_PREFIX_LENGTH = 2
+
+def tokenize(text) -> list[str]:
+    return TOKEN_RE.findall(text.lower())
+
+class SearchIndex:
+    """
+    inverted index of subject and author words and index of sha prefixes over rows of CommitTable,
+    rows are indexed as they are loaded (update) or put on top of table (prepend),
+    ids in postings are rows minus number of rows prepended so far so they survive prepending,
+    new words are appended and word list is sorted when prefix is looked up (not on every insert),
+    words shorter than MIN_PREFIX_LENGTH match whole words only so they do not expand to most of the vocabulary,
+    query words are matched starting with the one that has fewest postings, rows found so far are checked
+    against remaining words directly when that is cheaper than collecting their postings,
+    matches of recent query words are cached so typing query only looks up its last word
+    """
+    def __init__(self, commits: CommitTable):
+        self._commits = commits
+        self._count = 0
+        self._shift = 0
+        self._postings = defaultdict(lambda: array('i'))
+        self._words = []
+        self._sorted = True
+        self._author_words = dict()
+        self._sha_buckets = defaultdict(lambda: array('i'))
+        self._matches = LRUCache(WORD_CACHE_SIZE)
+
+    def __len__(self):
+        return self._count
+
+    def _index(self, y1, y2):
+        commits = self._commits
+        postings = self._postings
+        words = self._words
+        buckets = self._sha_buckets
+        author_words = self._author_words
+        shift = self._shift
+        for y in range(y1, y2):
+            id_ = y - shift
+            author = commits.author[y]
+            tokens = author_words.get(author)
+            if tokens is None:
+                tokens = author_words[author] = set(tokenize(commits.author_name(y)))
+            for token in tokens.union(tokenize(commits.subject[y])):
+                if token not in postings:
+                    words.append(token)
+                    self._sorted = False
+                postings[token].append(id_)
+            buckets[commits.sha_bytes(y)[:SHA_BUCKET_SIZE]].append(id_)
+
+    def update(self, count):
+        """
+        indexes rows of table up to count
+        """
+        if count > self._count:
+            self._index(self._count, count)
+            self._count = count
+            self._matches.clear()
+
+    def prepend(self, commits: CommitTable, count):
+        """
+        switches to table that has count new rows on top of indexed ones
+        """
+        self._commits = commits
+        self._shift += count
+        self._index(0, count)
+        self._count += count
+        self._matches.clear()
+
+    def _tokens(self, word) -> list[str]:
+        """
+        indexed words that word matches
+        """
+        if len(word) < MIN_PREFIX_LENGTH:
+            return [word] if word in self._postings else []
+        words = self._words
+        if not self._sorted:
+            words.sort()
+            self._sorted = True
+        i = bisect_left(words, word)
+        j = i
+        while j < len(words) and words[j].startswith(word):
+            j += 1
+        return words[i:j]
+
+    def _shaBucket(self, word):
+        if not SHA_PREFIX_RE.fullmatch(word):
+            return ()
+        prefix = bytes.fromhex(word[:len(word) // 2 * 2])
+        return self._sha_buckets.get(prefix[:SHA_BUCKET_SIZE], ())
+
+    def _cost(self, word) -> int:
+        """
+        number of postings that would be read to match word
+        """
+        ids = self._matches.get(word)
+        if ids is not None:
+            return len(ids)
+        postings = self._postings
+        return sum(len(postings[token]) for token in self._tokens(word)) + len(self._shaBucket(word))
+
+    def _word(self, word) -> frozenset[int]:
+        """
+        ids of rows having token that matches word or sha that starts with word
+        """
+        ids = self._matches.get(word)
+        if ids is not None:
+            return ids
+        ids = set()
+        for token in self._tokens(word):
+            ids.update(self._postings[token])
+        shift = self._shift
+        for id_ in self._shaBucket(word):
+            if self._commits.sha(id_ + shift).startswith(word):
+                ids.add(id_)
+        ids = frozenset(ids)
+        self._matches.put(word, ids, 1)
+        return ids
+
+    def _rowMatches(self, y, word) -> bool:
+        commits = self._commits
+        tokens = self._author_words[commits.author[y]].union(tokenize(commits.subject[y]))
+        if len(word) < MIN_PREFIX_LENGTH:
+            if word in tokens:
+                return True
+        elif any(token.startswith(word) for token in tokens):
+            return True
+        return SHA_PREFIX_RE.fullmatch(word) is not None and commits.sha(y).startswith(word)
+
+    def search(self, query) -> list[int]:
+        """
+        sorted rows matching all words of query, words match prefixes of words in subject and author name
+        (whole words if shorter than MIN_PREFIX_LENGTH) and prefixes of sha (at least 4 hex digits)
+        """
+        costs = sorted((self._cost(word), word) for word in set(tokenize(query)))
+        if len(costs) == 0:
+            return []
+        shift = self._shift
+        ids = self._word(costs[0][1])
+        for cost, word in costs[1:]:
+            if len(ids) == 0:
+                break
+            if cost <= len(ids) or word in self._matches:
+                ids = ids & self._word(word)
+            else:
+                ids = [id_ for id_ in ids if self._rowMatches(id_ + shift, word)]
+        return sorted(id_ + shift for id_ in ids)
@@ -0,0 +1,43 @@
+from PyQt5 import QtCore, QtGui, QtWidgets
+import tracing
+
+HUD_INTERVAL = 500
+
+class TraceHud(QtWidgets.QLabel):
+    """
+    overlay with count, last and total time of recorded spans, refreshed while visible
+    """
+    def __init__(self, parent = None):
+        super().__init__(parent)
+        font = QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.SystemFont.FixedFont)
+        self.setFont(font)
+        self.setAutoFillBackground(True)
+        palette = self.palette()
+        palette.setColor(QtGui.QPalette.ColorRole.Window, QtGui.QColor(0, 0, 0, 200))
+        palette.setColor(QtGui.QPalette.ColorRole.WindowText, QtGui.QColor(QtCore.Qt.GlobalColor.white))
+        self.setPalette(palette)
+        self.setMargin(6)
+        self.setAttribute(QtCore.Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(HUD_INTERVAL)
+        self._timer.timeout.connect(self.refresh)
+        self.hide()
+
+    def setVisible(self, visible):
+        super().setVisible(visible)
+        if visible:
+            self.refresh()
+            self._timer.start()
+        else:
+            self._timer.stop()
+
+    def refresh(self):
+        lines = ["{:<24} {:>6} {:>9} {:>9}".format('span', 'count', 'last ms', 'total ms')]
+        for name, count, last, total in tracing.summary():
+            lines.append("{:<24} {:>6} {:>9.2f} {:>9.1f}".format(name[:24], count, last * 1000, total * 1000))
+        self.setText('\n'.join(lines))
+        self.adjustSize()
+        parent = self.parentWidget()
+        if parent is not None:
+            self.move(parent.width() - self.width() - 10, 10)
+        self.raise_()
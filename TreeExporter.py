@@ -0,0 +1,31 @@
+from PyQt5 import QtCore
+from treeexport import export_tree
+import time
+import tracing
+
+class TreeExporter(QtCore.QThread):
+    """
+    writes files of tree to directory on a worker thread
+    """
+
+    progress = QtCore.pyqtSignal(int, int)
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, repo, tree, dest, parent = None):
+        super().__init__(parent)
+        self._repo = repo
+        self._tree = tree
+        self._dest = dest
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        t1 = time.perf_counter()
+        try:
+            count = export_tree(self._repo, self._tree, self._dest, progress = self.progress.emit, cancelled = lambda: self._cancelled)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        tracing.add('export tree', t1, time.perf_counter() - t1, files = count)
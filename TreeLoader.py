@@ -0,0 +1,59 @@
+from PyQt5 import QtCore
+from ObjectReader import ObjectReader
+from TreeModel import TreeListings
+from gitexec import CancelToken, Cancelled
+from gitgraph import parse_raw_commit
+from concurrent.futures import ThreadPoolExecutor
+import subprocess
+import tracing
+
+TREE_LOADER_WORKERS = 2
+
+class TreeLoader(QtCore.QObject):
+    """
+    reads root tree listing and details of commits on worker threads, every request gets next generation,
+    starting request cancels previous ones (their git processes are killed), only results of latest generation are emitted
+    """
+
+    loaded = QtCore.pyqtSignal(int, str, str, object)
+
+    def __init__(self, objects: ObjectReader, listings: TreeListings, parent = None):
+        super().__init__(parent)
+        self._objects = objects
+        self._listings = listings
+        self._executor = ThreadPoolExecutor(max_workers = TREE_LOADER_WORKERS)
+        self._generation = 0
+        self._token = None
+
+    def generation(self):
+        return self._generation
+
+    def load(self, commit) -> int:
+        self.cancel()
+        self._generation += 1
+        self._token = CancelToken()
+        self._executor.submit(self._load, self._generation, commit, self._token)
+        return self._generation
+
+    def cancel(self):
+        if self._token is not None:
+            self._token.cancel()
+            self._token = None
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait = True)
+
+    def _load(self, generation, commit, token: CancelToken):
+        if token.cancelled:
+            return
+        try:
+            with tracing.span('load tree'):
+                tree = self._objects.tree(commit)
+                self._listings.get(tree, token)
+                details = parse_raw_commit(self._objects.read(commit), commit)
+        except (Cancelled, KeyError, OSError, subprocess.CalledProcessError):
+            return
+        if token.cancelled or generation != self._generation:
+            return
+        self.loaded.emit(generation, commit, tree, details)
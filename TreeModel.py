@@ -0,0 +1,197 @@
+from PyQt5 import QtCore
+from PyQt5.QtCore import Qt
+from LRUCache import LRUCache
+from gitexec import iter_records, CancelToken
+
+TREE_CACHE_SIZE = 1000000
+
+def list_tree(repo, oid, token: CancelToken | None = None) -> list[tuple[str, str, str]]:
+    """
+    returns type, oid, name of entries of one tree (not recursive), subtrees first
+    """
+    entries = []
+    for record in iter_records(['git', 'ls-tree', '-z', oid], repo, b'\0', token = token):
+        info, name = record.split(b'\t', 1)
+        _, type_, oid_ = info.decode('ascii').split(' ')
+        entries.append((type_, oid_, name.decode('utf-8', errors='replace')))
+    entries.sort(key = lambda entry: entry[0] != 'tree')
+    return entries
+
+class TreeListings:
+    """
+    entries of trees keyed by tree oid, shared by models of all commits of repo
+    """
+    def __init__(self, repo, max_entries = TREE_CACHE_SIZE):
+        self._repo = repo
+        self._cache = LRUCache(max_entries)
+
+    def get(self, oid, token: CancelToken | None = None):
+        entries = self._cache.get(oid)
+        if entries is None:
+            entries = list_tree(self._repo, oid, token)
+            self._cache.put(oid, entries, max(1, len(entries)))
+        return entries
+
+    def resolve(self, tree, path, token: CancelToken | None = None) -> tuple[str, str] | None:
+        """
+        returns type and oid of entry at path (separated by /) under tree, None if there is no such entry
+        """
+        type_, oid = 'tree', tree
+        for name in path.split('/'):
+            if type_ != 'tree':
+                return None
+            for type_, oid, name_ in self.get(oid, token):
+                if name_ == name:
+                    break
+            else:
+                return None
+        return type_, oid
+
+    def clear(self):
+        self._cache.clear()
+
+class TreeNode:
+    __slots__ = ('type', 'oid', 'name', 'parent', 'row', 'children')
+
+    def __init__(self, type_, oid, name, parent, row):
+        self.type = type_
+        self.oid = oid
+        self.name = name
+        self.parent = parent
+        self.row = row
+        self.children = None
+
+    def path(self):
+        names = []
+        node = self
+        while node.parent is not None:
+            names.append(node.name)
+            node = node.parent
+        return '/'.join(reversed(names))
+
+class TreeModel(QtCore.QAbstractItemModel):
+    """
+    files of one commit, directories are listed when they are expanded
+    """
+    OidRole = Qt.ItemDataRole.UserRole
+    PathRole = Qt.ItemDataRole.UserRole + 1
+
+    def __init__(self, listings: TreeListings, tree = None, parent = None):
+        super().__init__(parent)
+        self._listings = listings
+        self._root = TreeNode('tree', tree, '', None, 0)
+        if tree is not None:
+            self._fetch(self._root)
+        else:
+            self._root.children = []
+
+    def setTree(self, tree):
+        """
+        shows files of another tree, listing of tree should be cached in listings to not block
+        """
+        self.beginResetModel()
+        self._root = TreeNode('tree', tree, '', None, 0)
+        self._fetch(self._root)
+        self.endResetModel()
+
+    def _node(self, index) -> TreeNode:
+        if not index.isValid():
+            return self._root
+        return index.internalPointer()
+
+    def _fetch(self, node: TreeNode):
+        node.children = [TreeNode(type_, oid, name, node, row) for row, (type_, oid, name) in enumerate(self._listings.get(node.oid))]
+
+    def index(self, row, column, parent = QtCore.QModelIndex()):
+        node = self._node(parent)
+        if node.children is None or row < 0 or row >= len(node.children) or column != 0:
+            return QtCore.QModelIndex()
+        return self.createIndex(row, column, node.children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        node = index.internalPointer().parent
+        if node is self._root:
+            return QtCore.QModelIndex()
+        return self.createIndex(node.row, 0, node)
+
+    def rowCount(self, parent = QtCore.QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        node = self._node(parent)
+        return 0 if node.children is None else len(node.children)
+
+    def columnCount(self, parent = QtCore.QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent = QtCore.QModelIndex()):
+        node = self._node(parent)
+        if node.children is not None:
+            return len(node.children) > 0
+        return node.type == 'tree'
+
+    def canFetchMore(self, parent):
+        node = self._node(parent)
+        return node.type == 'tree' and node.children is None
+
+    def fetchMore(self, parent):
+        node = self._node(parent)
+        if node.children is not None:
+            return
+        entries = self._listings.get(node.oid)
+        if len(entries) == 0:
+            node.children = []
+            return
+        self.beginInsertRows(parent, 0, len(entries) - 1)
+        self._fetch(node)
+        self.endInsertRows()
+
+    def data(self, index, role = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        node: TreeNode = index.internalPointer()
+        if role == Qt.ItemDataRole.DisplayRole:
+            return node.name
+        if role == self.OidRole:
+            return node.oid
+        if role == self.PathRole:
+            return node.path()
+        return None
+
+    def oid(self, index) -> str | None:
+        return self._node(index).oid if index.isValid() else None
+
+    def path(self, index) -> str | None:
+        return self._node(index).path() if index.isValid() else None
+
+    def findPath(self, path) -> QtCore.QModelIndex:
+        """
+        returns index of entry at path, directories on the way are fetched, invalid index if there is no such entry
+        """
+        index = QtCore.QModelIndex()
+        for name in path.split('/'):
+            if self.canFetchMore(index):
+                self.fetchMore(index)
+            node = self._node(index)
+            if node.children is None:
+                return QtCore.QModelIndex()
+            for child in node.children:
+                if child.name == name:
+                    index = self.createIndex(child.row, 0, child)
+                    break
+            else:
+                return QtCore.QModelIndex()
+        return index
+
+    def tree(self) -> str:
+        """
+        oid of root tree
+        """
+        return self._root.oid
+
+    def isDir(self, index) -> bool:
+        return index.isValid() and self._node(index).type == 'tree'
+
+    def isFile(self, index) -> bool:
+        return index.isValid() and self._node(index).type == 'blob'
@@ -32,6 +32,23 @@ class Ui_MainWindow(object):
         self.verticalLayout.setObjectName("verticalLayout")
         self.horizontalLayout_4 = QtWidgets.QHBoxLayout()
         self.horizontalLayout_4.setObjectName("horizontalLayout_4")
+        self.search = QtWidgets.QLineEdit(self.groupBox)
+        self.search.setMinimumSize(QtCore.QSize(200, 0))
+        self.search.setClearButtonEnabled(True)
+        self.search.setObjectName("search")
+        self.horizontalLayout_4.addWidget(self.search)
+        self.prevMatch = QtWidgets.QToolButton(self.groupBox)
+        self.prevMatch.setArrowType(QtCore.Qt.UpArrow)
+        self.prevMatch.setObjectName("prevMatch")
+        self.horizontalLayout_4.addWidget(self.prevMatch)
+        self.nextMatch = QtWidgets.QToolButton(self.groupBox)
+        self.nextMatch.setArrowType(QtCore.Qt.DownArrow)
+        self.nextMatch.setObjectName("nextMatch")
+        self.horizontalLayout_4.addWidget(self.nextMatch)
+        self.matches = QtWidgets.QLabel(self.groupBox)
+        self.matches.setText("")
+        self.matches.setObjectName("matches")
+        self.horizontalLayout_4.addWidget(self.matches)
         spacerItem = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
         self.horizontalLayout_4.addItem(spacerItem)
         self.showDate = QtWidgets.QCheckBox(self.groupBox)
@@ -68,11 +85,12 @@ class Ui_MainWindow(object):
         self.verticalLayout_2 = QtWidgets.QVBoxLayout(self.groupBox_2)
         self.verticalLayout_2.setContentsMargins(0, 0, 0, 0)
         self.verticalLayout_2.setObjectName("verticalLayout_2")
-        self.files = QtWidgets.QListView(self.groupBox_2)
+        self.files = QtWidgets.QTreeView(self.groupBox_2)
         font = QtGui.QFont()
         font.setFamily("Liberation Mono")
         self.files.setFont(font)
         self.files.setObjectName("files")
+        self.files.header().setVisible(False)
         self.verticalLayout_2.addWidget(self.files)
         self.fileGroup = QtWidgets.QGroupBox(self.horizontalSplitter)
         self.fileGroup.setObjectName("fileGroup")
@@ -89,6 +107,9 @@ class Ui_MainWindow(object):
         self.horizontalLayout_3.setObjectName("horizontalLayout_3")
         spacerItem2 = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
         self.horizontalLayout_3.addItem(spacerItem2)
+        self.exportFiles = QtWidgets.QPushButton(self.fileGroup)
+        self.exportFiles.setObjectName("exportFiles")
+        self.horizontalLayout_3.addWidget(self.exportFiles)
         self.save = QtWidgets.QPushButton(self.fileGroup)
         self.save.setObjectName("save")
         self.horizontalLayout_3.addWidget(self.save)
@@ -113,6 +134,9 @@ class Ui_MainWindow(object):
         _translate = QtCore.QCoreApplication.translate
         MainWindow.setWindowTitle(_translate("MainWindow", "git show"))
         self.groupBox.setTitle(_translate("MainWindow", "Commits"))
+        self.search.setPlaceholderText(_translate("MainWindow", "Search message, author or sha"))
+        self.prevMatch.setToolTip(_translate("MainWindow", "Previous match (Shift+F3)"))
+        self.nextMatch.setToolTip(_translate("MainWindow", "Next match (F3)"))
         self.showDate.setText(_translate("MainWindow", "Date"))
         self.showTime.setText(_translate("MainWindow", "Time"))
         self.showAuthor.setText(_translate("MainWindow", "Author"))
@@ -120,6 +144,7 @@ class Ui_MainWindow(object):
         self.prevCommit.setText(_translate("MainWindow", "Prev"))
         self.groupBox_2.setTitle(_translate("MainWindow", "Files"))
         self.fileGroup.setTitle(_translate("MainWindow", "File"))
+        self.exportFiles.setText(_translate("MainWindow", "Export..."))
         self.save.setText(_translate("MainWindow", "Save"))
         self.menuFile.setTitle(_translate("MainWindow", "&Repository"))
         self.openRepository.setText(_translate("MainWindow", "&Open"))
@@ -0,0 +1,191 @@
+from gitgraph import get_raw_log, iter_log, get_log, LaneLayout, set_colors
+from graphcache import write_cache, read_cache
+from CommitTable import CommitTable
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+KINDS = ['linear', 'branches', 'octopus', 'signed']
+PHASES = ['get_raw_log', 'iter_log', 'table', 'layout', 'colors', 'write_cache', 'read_cache']
+BRANCHES = 40
+AUTHORS = 50
+START_TIME = 1600000000
+
+SIGNATURE = ''.join([
+    'gpgsig -----BEGIN PGP SIGNATURE-----\n',
+    ' \n',
+    ''.join(' ' + 'iQIzBAABCAAdFiEE' * 4 + '\n' for i in range(12)),
+    ' =abcd\n',
+    ' -----END PGP SIGNATURE-----\n',
+])
+
+def generate(kind, count, seed = 1):
+    """
+    yields branch, parent indices, message of count commits, parents are always yielded before children
+    """
+    rnd = random.Random(seed)
+    heads = {'master': 0}
+    yield 'master', [], 'root'
+    for i in range(1, count):
+        r = rnd.random()
+        if kind == 'linear':
+            yield 'master', [i - 1], 'commit {}'.format(i)
+            continue
+        if r < 0.25:
+            branch = 'b{}'.format(rnd.randrange(BRANCHES))
+            parent = heads.get(branch, heads['master'])
+            heads[branch] = i
+            yield branch, [parent], 'work on {} {}'.format(branch, i)
+        elif r < 0.3 and len(heads) > 1:
+            branches = [branch for branch in heads if branch != 'master']
+            if kind == 'octopus':
+                branches = rnd.sample(branches, min(len(branches), rnd.randint(2, 7)))
+            else:
+                branches = [rnd.choice(branches)]
+            parents = [heads['master']] + [heads.pop(branch) for branch in branches]
+            heads['master'] = i
+            yield 'master', parents, 'merge {}'.format(' '.join(branches))
+        else:
+            parent = heads['master']
+            heads['master'] = i
+            yield 'master', [parent], 'commit {}'.format(i)
+
+def _fast_import(path, commits):
+    """
+    writes commits with one changed file each through git fast-import
+    """
+    process = subprocess.Popen(['git', 'fast-import', '--quiet'], cwd = path, stdin = subprocess.PIPE)
+    out = process.stdin
+    for i, (branch, parents, message) in enumerate(commits):
+        mark = i + 1
+        data = message.encode('utf-8')
+        out.write('commit refs/heads/{}\nmark :{}\n'.format(branch, mark).encode('ascii'))
+        out.write('author U{0} <u{0}@example.com> {1} +0000\n'.format(i % AUTHORS, START_TIME + i * 60).encode('ascii'))
+        out.write('committer U{0} <u{0}@example.com> {1} +0000\n'.format(i % AUTHORS, START_TIME + i * 60).encode('ascii'))
+        out.write('data {}\n'.format(len(data)).encode('ascii') + data + b'\n')
+        if len(parents) > 0:
+            out.write('from :{}\n'.format(parents[0] + 1).encode('ascii'))
+            for parent in parents[1:]:
+                out.write('merge :{}\n'.format(parent + 1).encode('ascii'))
+        out.write('M 644 inline f{}.txt\ndata 8\n{:08d}\n'.format(i % 100, i).encode('ascii'))
+    out.close()
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode, 'git fast-import')
+
+def _write_object(path, type_, data) -> str:
+    obj = '{} {}\0'.format(type_, len(data)).encode('ascii') + data
+    sha = hashlib.sha1(obj).hexdigest()
+    directory = os.path.join(path, '.git', 'objects', sha[:2])
+    os.makedirs(directory, exist_ok = True)
+    with open(os.path.join(directory, sha[2:]), 'wb') as f:
+        f.write(zlib.compress(obj, 1))
+    return sha
+
+def _write_signed(path, commits):
+    """
+    writes commit objects with gpgsig headers directly (fast-import can not write signatures), then packs them
+    """
+    blob = _write_object(path, 'blob', b'signed\n')
+    tree = _write_object(path, 'tree', b'100644 f.txt\0' + bytes.fromhex(blob))
+    shas = []
+    heads = dict()
+    for i, (branch, parents, message) in enumerate(commits):
+        ident = 'U{0} <u{0}@example.com> {1} +0000'.format(i % AUTHORS, START_TIME + i * 60)
+        lines = ['tree {}\n'.format(tree)]
+        lines.extend('parent {}\n'.format(shas[parent]) for parent in parents)
+        lines.append('author {}\ncommitter {}\n'.format(ident, ident))
+        lines.append(SIGNATURE)
+        lines.append('\n{}\n'.format(message))
+        shas.append(_write_object(path, 'commit', ''.join(lines).encode('utf-8')))
+        heads[branch] = shas[-1]
+    refs = ''.join('update refs/heads/{} {}\n'.format(branch, sha) for branch, sha in heads.items())
+    subprocess.run(['git', 'update-ref', '--stdin'], cwd = path, input = refs.encode('ascii'), check = True)
+    subprocess.run(['git', 'repack', '-a', '-d', '-q'], cwd = path, check = True)
+    subprocess.run(['git', 'prune'], cwd = path, check = True)
+
+def make_repo(path, kind, count, seed = 1):
+    """
+    creates synthetic repository of count commits, kind is one of KINDS
+    """
+    subprocess.run(['git', 'init', '-q', path], check = True)
+    commits = generate(kind, count, seed)
+    if kind == 'signed':
+        _write_signed(path, commits)
+    else:
+        _fast_import(path, commits)
+
+def timed(results, name, func, *args):
+    t1 = time.perf_counter()
+    value = func(*args)
+    results[name] = min(results.get(name, float('inf')), time.perf_counter() - t1)
+    return value
+
+def run_phases(repo, results, phases):
+    if 'get_raw_log' in phases:
+        timed(results, 'get_raw_log', get_raw_log, repo)
+    if 'iter_log' in phases:
+        timed(results, 'iter_log', lambda: sum(1 for record in iter_log(repo)))
+    commits: CommitTable = timed(results, 'table', get_log, repo)
+    layout = LaneLayout()
+    paths = timed(results, 'layout', layout.add_commits, commits)
+    if 'colors' in phases:
+        timed(results, 'colors', set_colors, commits, paths)
+    if 'write_cache' in phases:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'graph.cache')
+            timed(results, 'write_cache', write_cache, repo, [], commits, paths, layout.occupancy, path)
+            if 'read_cache' in phases:
+                timed(results, 'read_cache', read_cache, repo, path)
+    return len(commits)
+
+def git_version():
+    return subprocess.check_output(['git', '--version'], encoding = 'utf-8').strip()
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'times commit graph phases on synthetic repositories')
+    parser.add_argument('--kinds', nargs = '+', choices = KINDS, default = KINDS)
+    parser.add_argument('--commits', nargs = '+', type = int, default = [10000])
+    parser.add_argument('--phases', nargs = '+', choices = PHASES, default = PHASES)
+    parser.add_argument('--repeat', type = int, default = 3, help = 'best of repeat runs is reported')
+    parser.add_argument('--workdir', default = 'benchmark-repos', help = 'generated repositories are kept here and reused')
+    parser.add_argument('-o', '--output', help = 'json results file (stdout by default)')
+    args = parser.parse_args(argv)
+
+    results = []
+    for kind in args.kinds:
+        for count in args.commits:
+            repo = os.path.abspath(os.path.join(args.workdir, '{}-{}'.format(kind, count)))
+            if not os.path.exists(repo):
+                t1 = time.perf_counter()
+                make_repo(repo, kind, count)
+                print("generated {} in {:.3f} s".format(repo, time.perf_counter() - t1), file = sys.stderr)
+            times = dict()
+            for i in range(args.repeat):
+                rows = run_phases(repo, times, args.phases)
+            print("{} {}: {}".format(kind, count, ' '.join('{} {:.3f}'.format(name, value) for name, value in times.items())), file = sys.stderr)
+            results.append({'kind': kind, 'commits': count, 'rows': rows, 'seconds': times})
+
+    report = {
+        'python': platform.python_version(),
+        'git': git_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'results': results,
+    }
+    if args.output is None:
+        json.dump(report, sys.stdout, indent = 1)
+        print()
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent = 1)
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import subprocess
 import re
+import threading
+import tracing
 
 def octescape_decode(s):
     def rep(m):
@@ -21,3 +23,83 @@ def execute(args, cwd, split = True, octescape=True, binary=False):
         return output_text
     lines = output_text.split('\n')
     return lines
+
+def git_dir(repo):
+    return execute(['git', 'rev-parse', '--absolute-git-dir'], cwd = repo, split=False, octescape=False).strip()
+
+class Cancelled(Exception):
+    pass
+
+class CancelToken:
+    """
+    kills processes of commands started with this token when cancel is called from any thread
+    """
+    def __init__(self):
+        self.cancelled = False
+        self._processes = set()
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            for process in self._processes:
+                process.kill()
+
+    def _add(self, process):
+        with self._lock:
+            if self.cancelled:
+                process.kill()
+            self._processes.add(process)
+
+    def _remove(self, process):
+        with self._lock:
+            self._processes.discard(process)
+
+BLOCK_SIZE = 1024 * 1024
+
+def iter_blocks(args, cwd, sep = b'\n', block_size = BLOCK_SIZE, input = None, check = True, token: CancelToken | None = None):
+    """
+    runs command and yields lists of records (bytes, split at sep) from each block of output as soon as it is read,
+    records are not decoded, output is never held in memory as a whole,
+    raises CalledProcessError if command fails and output was read to the end, Cancelled if token was cancelled
+    """
+    process = subprocess.Popen(args, cwd=cwd, stdin=subprocess.DEVNULL if input is None else subprocess.PIPE, stdout=subprocess.PIPE)
+    if token is not None:
+        token._add(process)
+    if input is not None:
+        process.stdin.write(input)
+        process.stdin.close()
+    name = ' '.join(args[:2])
+    completed = False
+    try:
+        tail = b''
+        while True:
+            with tracing.span(name):
+                data = process.stdout.read1(block_size)
+            if data == b'':
+                break
+            records = (tail + data).split(sep)
+            tail = records.pop()
+            if len(records) > 0:
+                yield records
+        if tail != b'':
+            yield [tail]
+        completed = True
+    finally:
+        process.stdout.close()
+        if not completed:
+            process.kill()
+        returncode = process.wait()
+        if token is not None:
+            token._remove(process)
+    if token is not None and token.cancelled:
+        raise Cancelled(args)
+    if completed and check and returncode != 0:
+        raise subprocess.CalledProcessError(returncode, args)
+
+def iter_records(args, cwd, sep = b'\n', block_size = BLOCK_SIZE, input = None, check = True, token: CancelToken | None = None):
+    """
+    yields records of command output one by one, see iter_blocks
+    """
+    for records in iter_blocks(args, cwd, sep, block_size, input, check, token):
+        yield from records
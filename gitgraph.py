@@ -1,319 +1,569 @@
 from Path import Path
+from array import array
 from collections import defaultdict
-from Commit import Commit
-import re
-from gitexec import execute
-import datetime
+from Commit import Commit, parse_tz
+from CommitTable import CommitTable
+from Occupancy import Occupancy, lowest_free
+from gitexec import execute, iter_blocks, iter_records, BLOCK_SIZE
+from xml.sax.saxutils import escape
+import argparse
+import json
+import subprocess
+import sys
+import time
+import tracing
+
+def parse_ident(data: bytes, start, end):
+    """
+    "Name <email> 1700000000 +0100" -> name, time, tz offset (minutes)
+    """
+    tz = data.rfind(b' ', start, end)
+    time_ = data.rfind(b' ', start, tz)
+    email = data.rfind(b' <', start, time_)
+    name = data[start:email if email >= 0 else time_].decode('utf-8', errors='replace')
+    return name, int(data[time_ + 1:tz]), parse_tz(data[tz + 1:end].decode('ascii'))
 
-def matrix(value, rows, cols):
-    return [[value for x in range(cols)] for y in range(rows)]
+def parse_raw_commit(data: bytes, sha = None, indent = 0) -> Commit:
+    """
+    parses headers of raw commit (cat-file object, or git log --pretty=raw record that starts with commit line
+    and has message indented by 4 spaces), message and signature are not decoded, only their offsets are stored
+    """
+    commit = Commit(sha)
+    end = len(data)
+    pos = 0
+    while pos < end:
+        eol = data.find(b'\n', pos)
+        if eol < 0:
+            eol = end
+        if eol == pos:
+            pos += 1
+            break
+        space = data.find(b' ', pos, eol)
+        key = data[pos:space]
+        if key == b'parent':
+            commit.parent.append(data[space + 1:eol].decode('ascii'))
+        elif key == b'author':
+            commit.author, commit.author_time, commit.author_tz = parse_ident(data, space + 1, eol)
+        elif key == b'committer':
+            commit.committer, commit.committer_time, commit.committer_tz = parse_ident(data, space + 1, eol)
+        elif key == b'commit':
+            commit.sha = data[space + 1:eol].decode('ascii').split(' ', 1)[0]
+        elif key == b'gpgsig' or key == b'gpgsig-sha256':
+            sig_start = space + 1
+            while eol + 1 < end and data[eol + 1] == 0x20:
+                eol = data.find(b'\n', eol + 1)
+                if eol < 0:
+                    eol = end
+            commit._gpgsig = (sig_start, eol)
+        # tree, encoding, mergetag and continuation lines of other headers are skipped
+        pos = eol + 1
+    commit._raw = data
+    commit._message = (min(pos, end), end)
+    commit._indent = indent
+    return commit
 
-def find_path(p1, p2, grid) -> Path:
+def get_raw_log(repo) -> list[Commit]:
+    """
+    commits of all refs parsed from git log --pretty=raw
+    """
+    return [parse_raw_commit(record, indent = 4) for record in iter_records(['git', 'log', '--pretty=raw', '-z', '--all'], repo, b'\0')]
 
-    path = [p1]
+LOG_FORMAT = '%x1f'.join(['%H', '%P', '%an', '%ad', '%ct', '%s'])
 
-    def test_grid(x, y):
-        if x < 0:
-            return False
-        if y >= len(grid):
-            return False
-        return grid[y][x] == False
-    
-    def can_go(mx, my):
-        x1, y1 = path[-1]
-        p = (x1 + mx, y1 + my)
-        if p == p2:
-            return True
-        if test_grid(x1 + mx, y1 + my):
-            return True
-        return False
-    
-    def go(mx, my):
-        x1, y1 = path[-1]
-        path.append((x1 + mx, y1 + my))
-
-    def get_dxdy(p1, p2):
-        x1, y1 = p1
-        x2, y2 = p2
-        return x2 - x1, y2 - y1
-
-    while True:
-        p0 = path[-1]
-        dx, dy = get_dxdy(p0, p2)
-        if dx == 0 and dy == 0:
-            return Path(path)
-        
-        if dy < 0:
-            #print("failed to find path dy < 0", p1, p2)
-            return
-
-        if dx == 0:
-            if can_go(0, 1):
-                go(0, 1)
-                continue
-            elif can_go(-1, 1):
-                go(-1, 1)
-                continue
-        elif dx < 0:
-            if can_go(-1, 1):
-                go(-1, 1)
-                continue
-            elif can_go(0, 1):
-                go(0, 1)
-                continue
-            elif can_go(1, 1):
-                go(1, 1)
-                continue
-        elif dx > 0:
-            if can_go(1, 1):
-                go(1, 1)
-                continue
-            elif can_go(0, 1):
-                go(0, 1)
-                continue
-        
-        #print("find_path dx dy (not imp)", dx, dy)
-        break
+COLOR_PALETTE = [
+    '#335c67','#2a9d8f','#e09f3e','#9e2a2b','#540b0e'
+]
 
-def get_raw_log(repo) -> list[Commit]:
-    lines = execute(['git','log','--pretty=raw', '--all'], cwd = repo)
-    commits = []
-    commit = None
-    in_sig = False
-    for line in lines:
-        if in_sig:
-            commit.gpgsig.append(line)
-            if '-----END PGP SIGNATURE-----' in line:
-                in_sig = False
-            continue
-        m = re.match('commit ([0-9a-f]+)', line)
-        if m:
-            commit = Commit(m.group(1))
-            commits.append(commit)
-            continue
-        m = re.match('tree ([0-9a-f]+)', line)
-        if m:
-            continue
-        m = re.match('parent ([0-9a-f]+)', line)
-        if m:
-            commit.parent.append(m.group(1))
-            continue
-        m = re.match('author (.*) <(.*)> ([0-9]+) ([+-][0-9]+)', line)
-        if m:
-            commit.author = m.group(1)
-            commit.author_date = datetime.datetime.fromtimestamp(int(m.group(3)))
-            continue
-        m = re.match('committer (.*) <(.*)> ([0-9]+) ([+-][0-9]+)', line)
-        if m:
-            commit.committer = m.group(1)
-            commit.committer_date = datetime.datetime.fromtimestamp(int(m.group(3)))
-            continue
-        m = re.match('gpgsig (.*)', line)
-        if m:
-            commit.gpgsig.append(m.group(1))
-            in_sig = True
-            continue
-        commit.message.append(line)
-    return commits
+NO_COLOR = '#cccccc'
 
-def get_graph_geometry(repo) -> list[Commit]:
-    lines = execute(['git', 'log', '--graph', '--oneline', '--all'], cwd = repo, octescape=False)
-    y = 0
-    commits = []
-    for line in lines:
-        m = re.match('([\\\\/|* ]+)\\s+([0-9a-f]{6,}) (.*)', line)
-        if m:
-            sha_short = m.group(2)
-            message = m.group(3)
-            commit = Commit(None, sha_short)
-            commit.message_oneline = message
-            commit.y = y
-            commit.x = line.index('*') // 2
-            commits.append(commit)
-            y += 1
+def parse_log_record(record: bytes):
+    """
+    returns sha, parents, author, author time, author tz offset (minutes), committer time, subject
+    """
+    sha, parents, author, author_date, committer_time, subject = record.split(b'\x1f', 5)
+    author_time, author_tz = author_date.split(b' ')
+    return (sha.decode('ascii'), parents.decode('ascii').split(' ') if parents != b'' else [], author.decode('utf-8', errors='replace'),
+        int(author_time), parse_tz(author_tz.decode('ascii')), int(committer_time), subject.decode('utf-8', errors='replace'))
+
+def iter_log(repo, revs = None, block_size = BLOCK_SIZE):
+    """
+    yields parsed log records in topological order (children before parents) while git is still walking history,
+    revs limits history to given revisions (--all by default)
+    """
+    args = ['git', 'log', '-z', '--topo-order', '--date=raw', '--format=' + LOG_FORMAT]
+    if revs is None:
+        args.append('--all')
+        input = None
+    else:
+        args.append('--stdin')
+        input = ''.join(rev + '\n' for rev in revs).encode('utf-8')
+    blocks = iter_blocks(args, repo, b'\0', block_size, input)
+    try:
+        for block in blocks:
+            start = time.perf_counter()
+            records = [parse_log_record(record) for record in block]
+            tracing.add('parse log', start, time.perf_counter() - start, records = len(records))
+            yield from records
+    finally:
+        blocks.close()
+
+def get_log(repo, revs = None) -> CommitTable:
+    """
+    reads sha, parents, author, dates and subject of every commit in one history walk,
+    commits are in topological order (children before parents)
+    """
+    commits = CommitTable()
+    for record in iter_log(repo, revs):
+        commits.append(*record)
     return commits
 
-def merge_commit_info(commits2: list[Commit], commits: list[Commit], commit_dict: dict[str, Commit]):
+def get_tips(repo) -> list[str]:
     """
-    commits2 - geometry
-    commits - data
+    commits pointed by HEAD and refs (annotated tags are peeled)
     """
+    try:
+        with tracing.span('git show-ref'):
+            lines = execute(['git', 'show-ref', '--head', '--dereference'], cwd = repo, octescape=False)
+    except subprocess.CalledProcessError:
+        return []
+    refs = dict()
+    for line in lines:
+        if line == '':
+            continue
+        sha, name = line.split(' ', 1)
+        if name.endswith('^{}'):
+            name = name[:-3]
+        refs[name] = sha
+    return sorted(set(refs.values()))
 
-    sha_size = len(commits2[0].sha_short)
+class LaneLayout:
+    """
+    assigns commit columns and edge routes in one pass over commits in topological order,
+    every edge owns a lane from child row to parent row, lanes are reused as soon as they are freed,
+    only edges that wait for their parent are kept (occupancy of rows too unless disabled)
+    """
+    def __init__(self, occupancy = True):
+        self._active = 0
+        self._waiting = defaultdict(list)
+        self.occupancy = Occupancy() if occupancy else None
+
+    def _alloc(self):
+        lane = lowest_free(self._active)
+        self._active |= 1 << lane
+        return lane
+
+    def _release(self, lane):
+        self._active &= ~(1 << lane)
+
+    def place(self, sha: bytes, parents: list[bytes], y: int) -> tuple[int, int, list[Path]]:
+        """
+        lays out commit in row y without table, rows must be placed in order,
+        returns column, text column and paths ending in row
+        """
+        edges = self._waiting.pop(sha, [])
+        if len(edges) > 0:
+            x = min(lane for lane, child, child_x in edges)
+        else:
+            x = self._alloc()
+
+        paths = []
+        for lane, child, child_x in edges:
+            path = Path(route((child_x, child), lane, (x, y)))
+            path._commit = child
+            path._parent = y
+            paths.append(path)
+            if lane != x:
+                self._release(lane)
+
+        if self.occupancy is not None:
+            self.occupancy.append(self._active)
+        x2 = max(1, self._active.bit_length())
+
+        if len(parents) == 0:
+            self._release(x)
+        for i, parent in enumerate(parents):
+            lane = x if i == 0 else self._alloc()
+            self._waiting[parent].append((lane, y, x))
+        return x, x2, paths
+
+    def add(self, commits: CommitTable, y: int) -> list[Path]:
+        """
+        lays out row y, rows must be added in order
+        """
+        commits.x[y], commits.x2[y], paths = self.place(commits.sha_bytes(y), commits.parent_shas(y), y)
+        return paths
+
+    def add_commits(self, commits: CommitTable, start = 0) -> list[Path]:
+        paths = []
+        with tracing.span('layout', rows = len(commits) - start):
+            for y in range(start, len(commits)):
+                paths.extend(self.add(commits, y))
+        return paths
+
+    def waiting(self):
+        """
+        edges to parents that were not added yet as (parent sha, lane, child row, child column)
+        """
+        for sha, edges in self._waiting.items():
+            for lane, child, child_x in edges:
+                yield sha, lane, child, child_x
+
+    def stubs(self, end: int):
+        """
+        open-ended paths of waiting edges that go down to row end as (parent sha, path)
+        """
+        for sha, lane, child, child_x in self.waiting():
+            path = Path(route((child_x, child), lane, (lane, end)))
+            path._commit = child
+            path._parent = None
+            yield sha, path
+
+def prepend_commits(commits: CommitTable, occupancy: Occupancy, new_commits: CommitTable):
+    """
+    lays out new commits (children of history or new branches) above already laid out commits,
+    old rows keep their columns and routes, edges into old rows go through columns that are free there,
+    returns combined table and paths of new rows, old paths are not touched (rows of paths are stored minus shift of table)
+    """
+    k = len(new_commits)
+    if k == 0:
+        return commits, []
+
+    layout = LaneLayout()
+    new_paths = layout.add_commits(new_commits)
+    occupancy.prepend(layout.occupancy.rows())
+    commits = commits.prepended(new_commits)
+
+    with tracing.span('route waiting edges'):
+        for sha, lane, child, child_x in layout.waiting():
+            parent = commits.row(sha)
+            if parent is None:
+                continue
+            parent_x = commits.x[parent]
+            column = occupancy.free_lane(k, parent, parent_x)
+            points = [(child_x, child)]
+            if child < k - 1:
+                if lane != child_x:
+                    points.append((lane, child + 1))
+                points.append((lane, k - 1))
+            if parent > k:
+                points.append((column, k))
+                points.append((column, parent - 1))
+            points.append((parent_x, parent))
+            points = [p for i, p in enumerate(points) if i == 0 or p != points[i - 1]]
+            occupancy.mark(k, parent, column)
+            for y in range(k, parent):
+                commits.x2[y] = max(commits.x2[y], column + 1)
+            path = Path(points)
+            path._commit = child
+            path._parent = parent
+            new_paths.append(path)
+
+    shift = commits.shift
+    for path in new_paths:
+        path._points = [(x, y - shift) for x, y in path._points]
+        path._commit -= shift
+        path._parent -= shift
+    return commits, new_paths
+
+def route(p1, lane, p2):
+    """
+    edge from child p1 to parent p2 moving down in lane
+    """
+    x1, y1 = p1
+    x2, y2 = p2
+    points = [p1]
+    if y2 - y1 > 1:
+        if lane != x1:
+            points.append((lane, y1 + 1))
+        if lane != x2 and points[-1] != (lane, y2 - 1):
+            points.append((lane, y2 - 1))
+    points.append(p2)
+    return points
 
-    def shortened(sha):
-        return sha[:sha_size]
+def get_graph(repo, color_palette = None):
     
-    sha_dict = {shortened(commit.sha): commit.sha for commit in commits}
+    commits = get_log(repo)
 
-    for commit in commits:
-        commit.sha_short = shortened(commit.sha)
-    
-    commit: Commit
-    for commit in commits2:
-        dest = commit_dict[sha_dict[commit.sha_short]]
-        dest.x = commit.x
-        dest.y = commit.y
-        dest.message_oneline = commit.message_oneline
+    layout = LaneLayout()
 
-    commits.sort(key=lambda commit: commit.y)
+    paths = layout.add_commits(commits)
 
-def get_graph(repo, color_palette = None):
-    
-    commits2 = get_graph_geometry(repo)
+    set_colors(commits, paths, color_palette)
 
-    commits = get_raw_log(repo)
+    return commits, paths
 
-    commit_dict = {commit.sha: commit for commit in commits}
+def set_colors(commits: CommitTable, paths: list[Path], color_palette = None):
+    """
+    assigns colors and branch ids in two passes over commits (O(commits + edges)):
+    i-th child of a fork (commit with many children) gets fork color + i, child of many forks takes it from the nearest fork,
+    other commits keep color of first parent, branch is first-parent chain continued by the oldest first-parent child,
+    branch id is the row of its first commit counted from the bottom, so it does not change when newer commits are added
+    """
+    if color_palette is None:
+        color_palette = COLOR_PALETTE
 
-    merge_commit_info(commits2, commits, commit_dict)    
-        
-    paths = []
+    commits.palette = color_palette
 
-    grid = matrix(False, commits[-1].y + 1, 20)
+    n = len(commits)
+    if n == 0:
+        return
 
-    linked = set()
+    start = time.perf_counter()
 
-    def is_linked(commit, parent):
-        return (commit.sha, parent.sha) in linked
-    
-    def add_path(commit: Commit, parent: Commit, path: Path):
-        if path is None:
-            return
-        paths.append(path)
-        for x, y in path._points:
-            grid[y][x] = True
-        path._commit = commit.sha
-        path._parent = parent.sha
-        linked.add((commit.sha, parent.sha))
-
-    for commit in commits:
-        grid[commit.y][commit.x] = True
-
-    for i in range(5):
-        commit: Commit
-        for commit in commits:
-            for sha in commit.parent:
-                parent: Commit = commit_dict[sha]
-                if is_linked(commit, parent):
-                    continue
-                dx = parent.x - commit.x
-                dy = parent.y - commit.y
-                if i == 0:
-                    # short (vertical and diagonal)
-                    if -2 < dx < 2 and dy == 1:
-                        path = find_path(commit.p(), parent.p(), grid)
-                        add_path(commit, parent, path)
-
-                elif i == 1:
-                    # vertical
-                    if dx == 0:
-                        path = find_path(commit.p(), parent.p(), grid)
-                        add_path(commit, parent, path)
-
-                elif i == 2:
-                    # almost vertical
-                    if -2 < dx < 2 and dy > 1:
-                        path = find_path(commit.p(), parent.p(), grid)
-                        add_path(commit, parent, path)
-
-                elif i == 3:
-                    # all other
-                    path = find_path(commit.p(), parent.p(), grid)
-                    add_path(commit, parent, path)
-
-                elif i == 4:
-                    # give up, draw straight line
-                    path = Path([commit.p(), parent.p()])
-                    add_path(commit, parent, path)
-
-    def get_text_pos(y):
-        r = 0
-        for x, v in enumerate(grid[y]):
-            if v:
-                r = x
-        return r + 1
-
-    for commit in commits:
-        commit.x2 = get_text_pos(commit.y)
-
-    children = defaultdict(list)
-    for commit in commits:
-        for sha in commit.parent:
-            children[sha].append(commit.sha)
+    parent_start = commits._parent_start
+    parent_row = commits._parent
 
-    if color_palette is None:
-        color_palette = [
-            '#335c67','#2a9d8f','#e09f3e','#9e2a2b','#540b0e'
-        ]
+    # rank of child among children of each of its parents, in row order
+    child_count = array('i', bytes(4 * n))
+    child_rank = array('i', bytes(4 * len(parent_row)))
+    main_child = array('i', [-1]) * n
+    for y in range(n):
+        first = parent_start[y]
+        for pos in range(first, parent_start[y + 1]):
+            parent = parent_row[pos]
+            if parent < 0:
+                continue
+            child_rank[pos] = child_count[parent]
+            child_count[parent] += 1
+            if pos == first:
+                main_child[parent] = y
+
+    size = len(color_palette)
+    color = commits.color
+    branch = commits.branch
+    for y in reversed(range(n)):
+        first = parent_start[y]
+        last = parent_start[y + 1]
+        fork = -1
+        for pos in range(first, last):
+            parent = parent_row[pos]
+            if parent >= 0 and child_count[parent] > 1 and (fork < 0 or parent < parent_row[fork]):
+                fork = pos
+        first_parent = parent_row[first] if first < last else -1
+        if fork >= 0:
+            color[y] = (color[parent_row[fork]] + child_rank[fork]) % size
+        elif y == n - 1:
+            color[y] = 0
+        elif first_parent >= 0:
+            color[y] = color[first_parent]
+        else:
+            color[y] = -1
+        if first_parent >= 0 and main_child[first_parent] == y:
+            branch[y] = branch[first_parent]
+        else:
+            branch[y] = n - 1 - y
 
-    commit_color = dict()
+    shift = commits.shift
+    path: Path
+    for path in paths:
+        commit = path._commit + shift
+        if parent_start[commit + 1] - parent_start[commit] > 1:
+            y = path._parent + shift
+        else:
+            y = commit
+        path._color = color_palette[color[y]] if color[y] >= 0 else NO_COLOR
 
-    def is_fork(sha):
-        return len(children[sha]) > 1
+    tracing.add('colors', start, time.perf_counter() - start, rows = n)
 
-    def is_merge(commit):
-        return len(commit.parent) > 1
-    
-    commit_color[commits[-1].sha] = color_palette[0]
-
-    def traverse_for_color(commit):
-        parent = commit
-        while True:
-            if parent.sha in commit_color:
-                return commit_color[parent.sha]
-            if len(parent.parent) > 0:
-                parent = commit_dict[parent.parent[0]]
+class WindowColors:
+    """
+    assigns colors and branch ids top-down while rows are laid out, for history that is loaded in windows:
+    commit takes color and branch of its oldest first-parent child, i-th parent of merge that has no first-parent child
+    gets merge color + i, commits without children (tips) get next color and start new branch,
+    branch id is the row of branch's newest commit, colors and branches of laid out rows never change when older rows are added
+    """
+    def __init__(self, color_palette = None):
+        self.palette = COLOR_PALETTE if color_palette is None else color_palette
+        self._next = 0
+        self._waiting = dict()
+
+    def add(self, commits: CommitTable, y: int, paths: list[Path]):
+        """
+        colors row y (rows must be added in order) and paths ending in it
+        """
+        commits.palette = self.palette
+        size = len(self.palette)
+        main, offer = self._waiting.pop(commits.sha_bytes(y), (-1, -1))
+        if main >= 0:
+            commits.color[y] = commits.color[main]
+            commits.branch[y] = commits.branch[main]
+        else:
+            if offer >= 0:
+                commits.color[y] = offer
             else:
-                # should not happen
-                return '#cccccc'
+                commits.color[y] = self._next % size
+                self._next += 1
+            commits.branch[y] = y
+
+        color = commits.color[y]
+        for i, sha in enumerate(commits.parent_shas(y)):
+            waiting = self._waiting.setdefault(sha, [-1, -1])
+            if i == 0:
+                waiting[0] = y
+            else:
+                waiting[1] = (color + i) % size
 
-    def set_parent_colors(commit: Commit, color: str):
+        path: Path
+        for path in paths:
+            merge = len(commits.parents(path._commit)) > 1
+            path._color = self.palette[commits.color[y if merge else path._commit]]
 
-        if len(commit.parent) < 1:
-            print("len(commit.parent) < 1", commit)
-            return
+    def parent_color(self, commits: CommitTable, sha) -> int:
+        """
+        color that parent that is not laid out yet would get now
+        """
+        main, offer = self._waiting.get(sha, (-1, -1))
+        return commits.color[main] if main >= 0 else offer
 
-        parent = commit_dict[commit.parent[0]]
-        while True:
-            if parent.sha in commit_color:
-                return
-            else:
-                commit_color[parent.sha] = color
-            if len(parent.parent) > 0:
-                parent = commit_dict[parent.parent[0]]
-            else:
-                return
-
-    for commit in reversed(commits):
-        if is_fork(commit.sha):
-            parent_color = traverse_for_color(commit)
-            commit_color[commit.sha] = parent_color
-            set_parent_colors(commit, parent_color)
-            ix = color_palette.index(parent_color)
-            for i, sha in enumerate(children[commit.sha]):
-                commit_color[sha] = color_palette[(ix + i) % len(color_palette)]
-
-    for commit in reversed(commits):
-        if commit.sha in commit_color:
-            continue
-        if len(commit.parent) > 0:
-            #parent = commit_dict[commit.parent[0]]
-            commit_color[commit.sha] = commit_color[commit.parent[0]]
+def iter_layout(repo, revs = None, limit = None, layout: LaneLayout | None = None):
+    """
+    lays out commits while they are read from git log, yields (row, log record, column, text column, paths ending in row)
+    after each row, stops after limit rows, rows are not kept (layout keeps only edges waiting for parents)
+    """
+    if layout is None:
+        layout = LaneLayout(occupancy = False)
+    log = iter_log(repo, revs)
+    try:
+        for y, record in enumerate(log):
+            if limit is not None and y >= limit:
+                break
+            sha, parents = record[:2]
+            x, x2, paths = layout.place(bytes.fromhex(sha), [bytes.fromhex(parent) for parent in parents], y)
+            yield y, record, x, x2, paths
+    finally:
+        log.close()
+
+def stub_paths(commits: CommitTable, layout: LaneLayout, colors: WindowColors | None = None) -> list[Path]:
+    """
+    open-ended edges from laid out children to parents that are not laid out (below the last row),
+    colored like edges to parents will be if colors are given
+    """
+    paths = []
+    for sha, path in layout.stubs(len(commits)):
+        if colors is not None:
+            child = path._commit
+            merge = len(commits.parents(child)) > 1
+            color = colors.parent_color(commits, sha) if merge else commits.color[child]
+            path._color = colors.palette[color] if color >= 0 else NO_COLOR
+        paths.append(path)
+    return paths
 
-    for commit in reversed(commits):
-        if commit.sha in commit_color:
-            commit.color = commit_color[commit.sha]
-        else:
-            # should not happen
-            commit.color = '#cccccc'
+def count_commits(repo, revs = None) -> int:
+    args = ['git', 'rev-list', '--count']
+    args.append('--all' if revs is None else '--stdin')
+    output = subprocess.check_output(args, cwd = repo, input = '' if revs is None else ''.join(rev + '\n' for rev in revs), encoding = 'utf-8')
+    return int(output)
 
-    path: Path
-    for path in paths:
-        commit = commit_dict[path._commit]
-        if is_merge(commit):
-            path._color = commit_color.get(path._parent, '#cccccc')
+def write_layout_jsonl(out, repo, revs = None, limit = None):
+    """
+    writes one json object per line: {"type": "commit", ...} for every row preceded by {"type": "path", ...}
+    for edges from its children (edges ending in row), edges to commits beyond limit are written last with "parent": null
+    """
+    layout = LaneLayout(occupancy = False)
+    rows = 0
+
+    def write_path(path: Path):
+        out.write(json.dumps({'type': 'path', 'commit': path._commit, 'parent': path._parent, 'points': path._points}) + '\n')
+
+    for y, record, x, x2, paths in iter_layout(repo, revs, limit, layout):
+        sha, parents, author, author_time, author_tz, committer_time, subject = record
+        for path in paths:
+            write_path(path)
+        out.write(json.dumps({
+            'type': 'commit',
+            'y': y,
+            'x': x,
+            'x2': x2,
+            'sha': sha,
+            'parents': parents,
+            'author': author,
+            'author_time': author_time,
+            'author_tz': author_tz,
+            'subject': subject,
+        }, ensure_ascii = False) + '\n')
+        rows = y + 1
+    for sha, path in layout.stubs(rows):
+        write_path(path)
+
+SVG_PAD = 10
+SVG_COL_WIDTH = 18
+SVG_ROW_HEIGHT = 18
+SVG_WIDTH = 1000
+SVG_HEIGHT_DIGITS = 12
+
+def write_layout_svg(out, repo, revs = None, limit = None):
+    """
+    writes graph as svg while it is laid out, edges are colored by lane,
+    height is written over placeholder at the end when out is seekable,
+    otherwise commits are counted first (one more walk of history)
+    """
+    seekable = out.seekable()
+    if seekable:
+        rows = 0
+    else:
+        rows = count_commits(repo, revs)
+        if limit is not None:
+            rows = min(rows, limit)
+
+    def map_point(x, y):
+        return SVG_PAD + x * SVG_COL_WIDTH, SVG_PAD + y * SVG_ROW_HEIGHT + SVG_ROW_HEIGHT / 2
+
+    def write_path(path: Path):
+        lane = max(x for x, y in path._points)
+        points = ' '.join('{:g},{:g}'.format(*map_point(x, y)) for x, y in path._points)
+        out.write('<polyline points="{}" stroke="{}"/>\n'.format(points, COLOR_PALETTE[lane % len(COLOR_PALETTE)]))
+
+    def write_height(rows):
+        height = str(2 * SVG_PAD + rows * SVG_ROW_HEIGHT)
+        out.write('height="{}"{}'.format(height, ' ' * (SVG_HEIGHT_DIGITS - len(height))))
+
+    out.write('<svg xmlns="http://www.w3.org/2000/svg" width="{}" '.format(SVG_WIDTH))
+    height_pos = out.tell() if seekable else None
+    write_height(rows)
+    out.write(' font-family="sans-serif" font-size="12">\n')
+    out.write('<g fill="none" stroke-width="2">\n')
+    layout = LaneLayout(occupancy = False)
+    rows = 0
+    for y, record, x, x2, paths in iter_layout(repo, revs, limit, layout):
+        for path in paths:
+            write_path(path)
+        cx, cy = map_point(x, y)
+        tx, _ = map_point(x2, y)
+        out.write('<circle cx="{:g}" cy="{:g}" r="5" fill="{}" stroke="white"/>\n'.format(cx, cy, COLOR_PALETTE[x % len(COLOR_PALETTE)]))
+        out.write('<text x="{:g}" y="{:g}" dominant-baseline="middle" fill="black" stroke="none">{}</text>\n'.format(tx, cy, escape(record[-1])))
+        rows = y + 1
+    for sha, path in layout.stubs(rows):
+        write_path(path)
+    out.write('</g>\n</svg>\n')
+    if seekable:
+        end = out.tell()
+        out.seek(height_pos)
+        write_height(rows)
+        out.seek(end)
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog = 'gitgraph', description = 'lays out commit graph without gui')
+    commands = parser.add_subparsers(dest = 'command', required = True)
+    layout = commands.add_parser('layout', help = 'write layout of commits and edges')
+    layout.add_argument('repo')
+    layout.add_argument('revs', nargs = '*', help = 'revisions or ranges (all refs by default)')
+    layout.add_argument('-f', '--format', choices = ['jsonl', 'svg'], default = 'jsonl')
+    layout.add_argument('-n', '--limit', type = int, help = 'lay out at most this many commits')
+    layout.add_argument('-o', '--output', help = 'output file (stdout by default, svg written to stdout needs one more walk of history to count commits)')
+    parser.add_argument('--trace', help = 'write timing spans as chrome trace (or as list of spans if name ends with .spans.json), also set by ' + tracing.TRACE_ENV)
+    args = parser.parse_args(argv)
+    tracing.write_trace_at_exit(args.trace)
+
+    revs = args.revs if len(args.revs) > 0 else None
+    write = write_layout_jsonl if args.format == 'jsonl' else write_layout_svg
+    try:
+        if args.output is None:
+            write(sys.stdout, args.repo, revs, args.limit)
         else:
-            path._color = commit_color.get(path._commit, '#cccccc')
+            with open(args.output, 'w', encoding = 'utf-8') as out:
+                write(out, args.repo, revs, args.limit)
+    except subprocess.CalledProcessError as e:
+        layout.error('git failed to read history of {} (exit status {})'.format(' '.join(args.revs) or 'all refs', e.returncode))
 
-    return commits, paths
+if __name__ == "__main__":
+    main()
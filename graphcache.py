@@ -0,0 +1,110 @@
+from Path import Path
+from CommitTable import CommitTable
+from Occupancy import Occupancy
+from gitexec import git_dir
+from gitgraph import get_log, prepend_commits, set_colors
+import marshal
+import tracing
+import os
+import subprocess
+import zlib
+
+CACHE_MAGIC = b'gitshow graph cache 7\n'
+CACHE_NAME = 'gitshow-graph.cache'
+
+def cache_path(repo):
+    return os.path.join(git_dir(repo), CACHE_NAME)
+
+def write_cache(repo, tips, commits: CommitTable, paths: list[Path], occupancy: Occupancy, path = None) -> bool:
+    """
+    writes cache to path (cache in git dir of repo by default),
+    returns False if cache could not be written (read-only git dir, temporary file owned by someone else...)
+    """
+    data = {
+        'tips': tips,
+        'commits': commits.dump(),
+        'path_points': [path._points for path in paths],
+        'path_commit': [path._commit for path in paths],
+        'path_parent': [path._parent for path in paths],
+        'path_color': [path._color for path in paths],
+        'occupancy': occupancy.rows(),
+    }
+    if path is None:
+        path = cache_path(repo)
+    tmp = path + '.tmp'
+    try:
+        with tracing.span('write cache', rows = len(commits)):
+            with open(tmp, 'wb') as f:
+                f.write(CACHE_MAGIC)
+                f.write(zlib.compress(marshal.dumps(data), 1))
+            os.replace(tmp, path)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return False
+    return True
+
+def read_cache(repo, path = None):
+    """
+    returns tips, commits, paths, occupancy or None if there is no usable cache
+    """
+    if path is None:
+        path = cache_path(repo)
+    if not os.path.exists(path):
+        return
+    try:
+        with tracing.span('read cache'):
+            with open(path, 'rb') as f:
+                if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+                    return
+                data = marshal.loads(zlib.decompress(f.read()))
+    except (OSError, ValueError, EOFError, TypeError, zlib.error):
+        return
+
+    commits = CommitTable.load(data['commits'])
+
+    paths = []
+    for points, commit, parent, color in zip(data['path_points'], data['path_commit'], data['path_parent'], data['path_color']):
+        path = Path(points, color)
+        path._commit = commit
+        path._parent = parent
+        paths.append(path)
+
+    occupancy = Occupancy(data['occupancy'])
+
+    return data['tips'], commits, paths, occupancy
+
+def is_history_kept(repo, old_tips, tips):
+    """
+    True if every commit reachable from old tips is still reachable from tips
+    """
+    revs = old_tips + ['^' + sha for sha in tips]
+    try:
+        output = subprocess.check_output(['git', 'rev-list', '--count', '--stdin'], cwd = repo, input = '\n'.join(revs) + '\n', encoding = 'utf-8', stderr = subprocess.DEVNULL)
+    except subprocess.CalledProcessError:
+        return False
+    return int(output) == 0
+
+def load_cached_graph(repo, tips):
+    """
+    returns commits, paths, occupancy for tips from cache, commits added since the cache was written
+    are laid out on top of cached layout, returns None if cache is missing, has no tips or history was rewritten
+    """
+    cached = read_cache(repo)
+    if cached is None:
+        return
+    old_tips, commits, paths, occupancy = cached
+    if len(old_tips) == 0:
+        return
+    if old_tips == tips:
+        return commits, paths, occupancy
+    if not is_history_kept(repo, old_tips, tips):
+        return
+    new_commits = get_log(repo, tips + ['^' + sha for sha in old_tips])
+    commits, new_paths = prepend_commits(commits, occupancy, new_commits)
+    paths = new_paths + paths
+    set_colors(commits, paths)
+    write_cache(repo, tips, commits, paths, occupancy)
+    return commits, paths, occupancy
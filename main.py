@@ -7,15 +7,32 @@ from Path import Path
 from collections import defaultdict
 from MainWindow import MainWindow
 from gitgraph import get_graph
+from datetime import datetime
+import argparse
+import tracing
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('repo', nargs='?')
+    parser.add_argument('--trace', help='write timing spans as chrome trace on exit (or as list of spans if name ends with .spans.json), also set by ' + tracing.TRACE_ENV)
+    parser.add_argument('--hud', action='store_true', help='show timing spans overlay (toggle with F12)')
+    parser.add_argument('--window', type=int, help='load only this many newest commits, older commits are loaded when scrolled to')
+    parser.add_argument('--since', help='load only commits newer than date (YYYY-MM-DD), older commits are loaded when scrolled to')
+    parser.add_argument('--cache-size', type=int, help='memory cap of object cache in MB, commits around selection are prefetched into it')
+    args = parser.parse_args()
+    tracing.write_trace_at_exit(args.trace)
     app = QtWidgets.QApplication([])
     mainWindow = MainWindow()
     mainWindow.show()
-    args = sys.argv[1:]
-    if len(args) == 1:
-        path = args[0]
-        mainWindow.openRepository(path)
+    if args.hud:
+        mainWindow.setHudVisible(True)
+    if args.window is not None or args.since is not None:
+        since = datetime.fromisoformat(args.since).timestamp() if args.since is not None else None
+        mainWindow.setWindow(args.window, since)
+    if args.cache_size is not None:
+        mainWindow.setCacheSize(args.cache_size * 1024 * 1024)
+    if args.repo is not None:
+        mainWindow.openRepository(args.repo)
     app.exec_()
 
 def test():
@@ -0,0 +1,96 @@
+from collections import deque
+from contextlib import contextmanager
+import atexit
+import json
+import os
+import threading
+import time
+
+SPAN_BUFFER_SIZE = 8192
+TRACE_ENV = 'GITSHOW_TRACE'
+
+class Span:
+    __slots__ = ('name', 'start', 'duration', 'thread', 'args')
+
+    def __init__(self, name, start, duration, thread, args):
+        self.name = name
+        self.start = start
+        self.duration = duration
+        self.thread = thread
+        self.args = args
+
+    def to_dict(self):
+        return {'name': self.name, 'start': self.start, 'duration': self.duration, 'thread': self.thread, 'args': self.args}
+
+_spans = deque(maxlen = SPAN_BUFFER_SIZE)
+
+def add(name, start, duration, **args):
+    """
+    records span that started at start (perf_counter seconds) and took duration seconds
+    """
+    _spans.append(Span(name, start, duration, threading.current_thread().name, args))
+
+@contextmanager
+def span(name, **args):
+    """
+    records time spent in with block
+    """
+    start = time.perf_counter()
+    try:
+        yield args
+    finally:
+        add(name, start, time.perf_counter() - start, **args)
+
+def spans() -> list[Span]:
+    return list(_spans)
+
+def clear():
+    _spans.clear()
+
+def summary() -> list[tuple[str, int, float, float]]:
+    """
+    returns name, count, last duration, total duration of recorded spans grouped by name, in order of last occurrence
+    """
+    groups = dict()
+    for item in spans():
+        count, last, total = groups.pop(item.name, (0, 0.0, 0.0))
+        groups[item.name] = (count + 1, item.duration, total + item.duration)
+    return [(name, count, last, total) for name, (count, last, total) in groups.items()]
+
+def write_json(path):
+    with open(path, 'w') as f:
+        json.dump([item.to_dict() for item in spans()], f, indent = 1)
+
+def write_chrome_trace(path):
+    """
+    writes spans in chrome trace event format (open in chrome://tracing or perfetto)
+    """
+    threads = dict()
+    events = []
+    pid = os.getpid()
+    for item in spans():
+        tid = threads.setdefault(item.thread, len(threads) + 1)
+        events.append({'name': item.name, 'ph': 'X', 'ts': item.start * 1e6, 'dur': item.duration * 1e6, 'pid': pid, 'tid': tid, 'args': item.args})
+    for name, tid in threads.items():
+        events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}})
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events}, f)
+
+def write_trace(path):
+    """
+    writes chrome trace, or plain json list of spans if path ends with .spans.json
+    """
+    if path.endswith('.spans.json'):
+        write_json(path)
+    else:
+        write_chrome_trace(path)
+
+def write_trace_at_exit(path = None):
+    """
+    writes trace to path (or path from GITSHOW_TRACE environment variable) when program exits
+    """
+    if path is None:
+        path = os.environ.get(TRACE_ENV)
+    if not path:
+        return
+    atexit.register(write_trace, path)
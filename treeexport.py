@@ -0,0 +1,84 @@
+from ObjectReader import ObjectReader
+from gitexec import iter_records
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import os
+import threading
+
+EXPORT_WORKERS = 4
+EXPORT_QUEUE_SIZE = EXPORT_WORKERS * 4
+
+def list_files(repo, tree) -> list[tuple[str, str, str]]:
+    """
+    returns mode, oid, path of every blob under tree (recursive)
+    """
+    files = []
+    for record in iter_records(['git', 'ls-tree', '-r', '-z', tree], repo, b'\0'):
+        info, path = record.split(b'\t', 1)
+        mode, type_, oid = info.decode('ascii').split(' ')
+        if type_ != 'blob':
+            continue
+        files.append((mode, oid, os.fsdecode(path)))
+    return files
+
+def export_file(reader: ObjectReader, mode, oid, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok = True)
+    if mode == '120000':
+        target = reader.read(oid)
+        try:
+            if os.path.lexists(path):
+                os.remove(path)
+            os.symlink(target, path)
+            return
+        except OSError:
+            pass
+    with open(path, 'wb') as f:
+        reader.copy(oid, f)
+    if mode == '100755':
+        os.chmod(path, os.stat(path).st_mode | 0o111)
+
+def export_tree(repo, tree, dest, workers = EXPORT_WORKERS, progress = None, cancelled = None) -> int:
+    """
+    writes all files of tree to dest directory, blobs are streamed by pool of workers
+    each reading through its own git cat-file process, at most EXPORT_QUEUE_SIZE files are in flight,
+    progress(done, total) is called after each file, returns number of exported files
+    """
+    files = list_files(repo, tree)
+    total = len(files)
+    local = threading.local()
+    readers = []
+    lock = threading.Lock()
+
+    def reader():
+        if not hasattr(local, 'reader'):
+            local.reader = ObjectReader(repo, 0)
+            with lock:
+                readers.append(local.reader)
+        return local.reader
+
+    def job(mode, oid, path):
+        export_file(reader(), mode, oid, os.path.join(dest, path))
+
+    done = 0
+    pending = set()
+    try:
+        with ThreadPoolExecutor(max_workers = workers) as executor:
+            for mode, oid, path in files:
+                if cancelled is not None and cancelled():
+                    break
+                if len(pending) >= EXPORT_QUEUE_SIZE:
+                    completed, pending = wait(pending, return_when = FIRST_COMPLETED)
+                    for future in completed:
+                        future.result()
+                        done += 1
+                        if progress is not None:
+                            progress(done, total)
+                pending.add(executor.submit(job, mode, oid, path))
+            for future in pending:
+                future.result()
+                done += 1
+                if progress is not None:
+                    progress(done, total)
+    finally:
+        for reader_ in readers:
+            reader_.close()
+    return done